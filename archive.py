@@ -0,0 +1,205 @@
+# archive.py
+#
+# Compact append-only archive of assessment results. Each record is two
+# bytes: the input code from codec.encode (2 bits of age group, 6 yes/no
+# flags) and a result code indexing the file's explanation dictionary, which
+# maps result codes to (risk level, explanation). The dictionary lives in a
+# reserved area after the header, so new explanations (e.g. after a rule
+# change) can be added in place; each rewrite bumps its version.
+#
+# Layout (little endian):
+#   header      32 bytes, see HEADER
+#   dictionary  DICT_CAPACITY bytes reserved, UTF-8 JSON, dict_length used
+#   records     2 bytes each (input code, result code) up to end of file
+#
+# ArchiveReader maps the records into memory and exposes them as zero-copy
+# NumPy views.
+
+import json
+import os
+import struct
+
+import numpy as np
+
+import codec
+
+MAGIC = b"LRAR"
+FORMAT_VERSION = 1
+# magic, format version, record size, dict version, dict length, dict capacity, data offset, reserved
+HEADER = struct.Struct("<4sHHIIII8x")
+DICT_CAPACITY = 64 * 1024
+RECORD_DTYPE = np.dtype([("inputs", "u1"), ("result", "u1")])
+MAX_RESULTS = 256
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _read_header(f):
+    raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ArchiveError("File too short for an archive header")
+    magic, version, record_size, dict_version, dict_length, dict_capacity, data_offset = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ArchiveError("Not an assessment archive")
+    if version != FORMAT_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ArchiveError(f"Unsupported archive format version {version}")
+    f.seek(HEADER.size)
+    entries = json.loads(f.read(dict_length).decode("utf-8"))["entries"] if dict_length else []
+    return {
+        "dict_version": dict_version,
+        "dict_capacity": dict_capacity,
+        "data_offset": data_offset,
+        "entries": [tuple(entry) for entry in entries],
+    }
+
+
+class ArchiveWriter:
+    """Appends assessments to an archive, creating it if needed.
+
+    Single writer per file. Records are buffered and written by flush()
+    (automatically every buffer_size records) and on close().
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, "r+b")
+            header = _read_header(self._file)
+            self._dict_version = header["dict_version"]
+            self._data_offset = header["data_offset"]
+            self._dict_capacity = header["dict_capacity"]
+            self.entries = header["entries"]
+            # Drop a torn trailing record left by an interrupted write
+            end = self._file.seek(0, os.SEEK_END)
+            records = (end - self._data_offset) // RECORD_DTYPE.itemsize
+            self._file.truncate(self._data_offset + records * RECORD_DTYPE.itemsize)
+        else:
+            self._file = open(path, "w+b")
+            self._dict_version = 0
+            self._dict_capacity = DICT_CAPACITY
+            self._data_offset = HEADER.size + DICT_CAPACITY
+            self.entries = []
+            self._file.write(bytes(self._data_offset))
+            self._write_dictionary()
+
+        self._codes = {entry: code for code, entry in enumerate(self.entries)}
+        self._file.seek(0, os.SEEK_END)
+
+    def _write_dictionary(self):
+        payload = json.dumps({"entries": [list(entry) for entry in self.entries]}).encode("utf-8")
+        if len(payload) > self._dict_capacity:
+            raise ArchiveError("Explanation dictionary exceeds its reserved space")
+        self._dict_version += 1
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize, self._dict_version,
+                                     len(payload), self._dict_capacity, self._data_offset))
+        self._file.write(payload)
+        self._file.flush()
+        self._file.seek(0, os.SEEK_END)
+
+    def result_code(self, risk_level, explanation):
+        # Dictionary code for a result, adding it (and bumping the version) if new
+        entry = (str(risk_level), str(explanation))
+        code = self._codes.get(entry)
+        if code is None:
+            if len(self.entries) >= MAX_RESULTS:
+                raise ArchiveError(f"More than {MAX_RESULTS} distinct results")
+            code = self._codes[entry] = len(self.entries)
+            self.entries.append(entry)
+            self._write_dictionary()
+        return code
+
+    def append(self, user_inputs, risk_level, explanation):
+        input_code = codec.encode(user_inputs)
+        self._buffer += bytes((input_code, self.result_code(risk_level, explanation)))
+        if len(self._buffer) >= self.buffer_size * RECORD_DTYPE.itemsize:
+            self.flush()
+
+    def append_many(self, assessments):
+        # assessments: iterable of (user_inputs, risk_level, explanation)
+        for user_inputs, risk_level, explanation in assessments:
+            self.append(user_inputs, risk_level, explanation)
+
+    def append_codes(self, input_codes, result_codes):
+        # Columnar append, e.g. from the vectorized backend after mapping its
+        # explanation indices through result_code()
+        records = np.empty(len(input_codes), dtype=RECORD_DTYPE)
+        records["inputs"] = input_codes
+        records["result"] = result_codes
+        self.flush()
+        self._file.write(records.tobytes())
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArchiveReader:
+    """Memory-mapped, read-only view of an archive."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            size = f.seek(0, os.SEEK_END)
+        self.path = path
+        self.dict_version = header["dict_version"]
+        self.entries = header["entries"]
+
+        count = (size - header["data_offset"]) // RECORD_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=header["data_offset"], shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def input_codes(self):
+        return self.records["inputs"]
+
+    @property
+    def result_codes(self):
+        return self.records["result"]
+
+    def risk_levels(self):
+        # Risk level names in dictionary order, and a per-record index into them
+        names = sorted({level for level, _ in self.entries})
+        lookup = np.array([names.index(level) for level, _ in self.entries] or [0], dtype=np.uint8)
+        return names, lookup[self.result_codes]
+
+    def result_counts(self):
+        # {(risk level, explanation): count} over the whole archive
+        counts = np.bincount(self.result_codes, minlength=len(self.entries))
+        return {entry: int(count) for entry, count in zip(self.entries, counts)}
+
+    def combination_counts(self):
+        # {(input code, risk level, explanation): count}, like AssessmentStore.result_counts()
+        pairs = self.input_codes.astype(np.uint32) << 8 | self.result_codes
+        counts = np.bincount(pairs, minlength=codec.TABLE_SIZE << 8)
+        return {
+            (int(pair >> 8),) + tuple(self.entries[pair & 0xFF]): int(counts[pair])
+            for pair in np.flatnonzero(counts)
+        }
+
+    def __getitem__(self, index):
+        inputs, result = self.records[index]
+        risk_level, explanation = self.entries[result]
+        return codec.unpack_inputs(int(inputs)), risk_level, explanation
@@ -0,0 +1,175 @@
+# audit.py
+#
+# Structured audit trail of assessments: one compact JSON line per patient
+# with the inputs, the result, the rule that decided it and how long it took.
+#
+#   {"ts": "2026-10-18T09:30:12.345", "inputs": {...}, "risk-level": "high",
+#    "explanation": "...", "rule": "high-risk-1", "ms": 0.41}
+#
+# The engine hands each assessment to the AuditLog, which only puts a tuple
+# holding the patient's input code on a bounded queue; formatting and file
+# I/O happen on a background writer thread that writes whole batches at a
+# time and rotates the file by size. With a full queue, the "drop" policy
+# discards the record (and counts it) while "block" makes the caller wait.
+# When no log is installed the engine skips all of this, so nothing is
+# formatted at all.
+#
+#   audit.start_audit("audit.jsonl", max_bytes=50 * 1024 * 1024, policy="drop")
+#
+# Decision-table hits carry "rule": null, since no rule ran for them. Batch
+# assessments carry the batch size and the batch time split evenly, and
+# assessments scored with a registered rule set carry its "ruleset" key.
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import codec
+import engine
+
+POLICIES = ("drop", "block")
+
+
+class AuditLog:
+    """Queue plus background writer for the JSONL audit trail."""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backups=5, queue_size=10000, policy="drop",
+                 batch_size=1000, flush_interval=1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown audit policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._file = None
+        self._size = 0
+        self._thread = None
+
+    # Caller side: no formatting here
+
+    def record(self, code, result, rule=None, seconds=None, batch=None, ruleset=None):
+        # code is the patient's input code (see codec.py)
+        self._put((time.time(), code, result, rule, seconds, batch, ruleset))
+
+    def record_batch(self, codes, results, rules, seconds, ruleset=None):
+        # One record per patient of a batch; each gets an equal share of the time
+        share = seconds / len(codes) if codes else 0.0
+        for code, result, rule in zip(codes, results, rules):
+            self.record(code, result, rule, share, len(codes), ruleset)
+
+    def _put(self, entry):
+        if self.policy == "block":
+            self._queue.put(entry)
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    # Writer thread
+
+    def start(self):
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        # Write out everything queued so far, then close the file
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                entries = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(entries) < self.batch_size:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in entries:
+                stopping = True
+                entries = [entry for entry in entries if entry is not None]
+            try:
+                self._write(entries)
+            except OSError:
+                logging.exception("Could not write %d audit records to %s", len(entries), self.path)
+        self._file.close()
+
+    def _format(self, entry):
+        timestamp, code, result, rule, seconds, batch, ruleset = entry
+        record = {
+            "ts": datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+            "inputs": codec.unpack_inputs(code),
+            "risk-level": str(result[0]),
+            "explanation": str(result[1]),
+            "rule": rule,
+        }
+        if seconds is not None:
+            record["ms"] = round(seconds * 1000, 3)
+        if batch is not None:
+            record["batch"] = batch
+        if ruleset is not None:
+            record["ruleset"] = ruleset
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+    def _write(self, entries):
+        data = "".join(self._format(entry) for entry in entries).encode("utf-8")
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self.written += len(entries)
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        # audit.jsonl -> audit.jsonl.1 -> ... -> audit.jsonl.<backups>, oldest dropped
+        self._file.close()
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{index}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+
+def start_audit(path, **options):
+    # Start auditing every engine assessment to path
+    log = AuditLog(path, **options).start()
+    previous = engine.set_audit(log)
+    if previous is not None:
+        previous.stop()
+    return log
+
+
+def stop_audit():
+    # Detach the current log, write out its queue and return it
+    log = engine.set_audit(None)
+    if log is not None:
+        log.stop()
+    return log
@@ -0,0 +1,186 @@
+# batch_score.py
+#
+# Headless batch scoring: read patient records from CSV or JSONL (a file or
+# stdin), score them in chunks and stream the results back out. Every stage is
+# a generator, so memory stays flat however large the input is. Rows that fail
+# to parse or validate go to a separate error channel instead of aborting.
+#
+#   python batch_score.py patients.csv -o scored.csv --workers 4
+#   cat patients.jsonl | python batch_score.py --format jsonl > scored.jsonl
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+
+import codec
+import engine
+from archive import ArchiveWriter
+from pool import ProcessEnginePool
+from store import AssessmentStore
+
+
+def read_records(stream, fmt):
+    # Yield (line number, record, parse error) for each input row
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "row has more fields than the header"
+            else:
+                yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "record is not a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def valid_records(rows, errors):
+    # Pass through valid (record, inputs) pairs; report everything else to errors
+    for line_number, record, error in rows:
+        if error is None:
+            try:
+                yield record, codec.normalize(record)
+                continue
+            except ValueError as e:
+                error = str(e)
+        errors.report(line_number, record, error)
+
+
+def score_serial(inputs, chunk_size):
+    inputs = iter(inputs)
+    while True:
+        chunk = list(itertools.islice(inputs, chunk_size))
+        if not chunk:
+            return
+        yield from engine.infer_risk_batch(chunk)
+
+
+def score_records(records, scorer, store=None, archive=None):
+    # Attach (risk-level, explanation) to each record; tee only buffers the
+    # records whose chunks are still being scored
+    for_scoring, for_output = itertools.tee(records)
+    results = scorer(inputs for _, inputs in for_scoring)
+    for (record, inputs), (risk_level, explanation) in zip(for_output, results):
+        if store is not None:
+            store.add(inputs, risk_level, explanation)
+        if archive is not None:
+            archive.append(inputs, risk_level, explanation)
+        yield {**record, "risk-level": str(risk_level), "explanation": str(explanation)}
+
+
+class ErrorChannel:
+    """Writes rejected rows as JSON lines and counts them."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def report(self, line_number, record, error):
+        self.count += 1
+        entry = {"line": line_number, "error": error, "record": record}
+        self.stream.write(json.dumps(entry) + "\n")
+
+
+def write_results(results, stream, fmt):
+    count = 0
+    if fmt == "csv":
+        writer = None
+        for result in results:
+            if writer is None:
+                # Input columns in their original order, then the result columns
+                writer = csv.DictWriter(stream, fieldnames=list(result), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(result)
+            count += 1
+    else:
+        for result in results:
+            stream.write(json.dumps(result) + "\n")
+            count += 1
+    return count
+
+
+def _detect_format(path, default="csv"):
+    if path and path != "-":
+        ext = os.path.splitext(path)[1].lower()
+        if ext in (".jsonl", ".ndjson", ".json"):
+            return "jsonl"
+        if ext == ".csv":
+            return "csv"
+    return default
+
+
+def _open(path, mode):
+    if path is None or path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score patient records with the lung risk rule set.")
+    parser.add_argument("input", nargs="?", default="-", help="CSV or JSONL file (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from extension, else csv)")
+    parser.add_argument("--output-format", choices=("csv", "jsonl"), help="output format (default: same as input)")
+    parser.add_argument("--errors", help="write rejected rows here as JSONL (default: stderr)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="patients per engine run (default: 1000)")
+    parser.add_argument("--workers", type=int, default=1, help="score in N worker processes (default: 1)")
+    parser.add_argument("--store", help="also record every assessment in this SQLite assessment store")
+    parser.add_argument("--archive", help="also append every assessment to this binary archive")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log at INFO level")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    in_format = args.format or _detect_format(args.input)
+    out_format = args.output_format or _detect_format(args.output, in_format)
+
+    source = _open(args.input, "r")
+    sink = _open(args.output, "w")
+    error_stream = _open(args.errors, "w") if args.errors else sys.stderr
+    errors = ErrorChannel(error_stream)
+
+    pool = None
+    store = AssessmentStore(args.store) if args.store else None
+    archive = ArchiveWriter(args.archive) if args.archive else None
+    try:
+        if args.workers > 1:
+            pool = ProcessEnginePool(args.workers, chunk_size=args.chunk_size)
+            scorer = pool.imap
+        else:
+            def scorer(inputs):
+                return score_serial(inputs, args.chunk_size)
+
+        rows = read_records(source, in_format)
+        results = score_records(valid_records(rows, errors), scorer, store, archive)
+        scored = write_results(results, sink, out_format)
+    finally:
+        if pool is not None:
+            pool.close()
+        if store is not None:
+            store.close()
+        if archive is not None:
+            archive.close()
+        for stream in (source, sink, error_stream):
+            if stream not in (sys.stdin, sys.stdout, sys.stderr):
+                stream.close()
+
+    print(f"Scored {scored} records, rejected {errors.count}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
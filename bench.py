@@ -0,0 +1,216 @@
+# bench.py
+#
+# Repeatable benchmarks for the engine and report generation. Results are
+# written as JSON and can be compared against a stored baseline; any metric
+# that regresses by more than the threshold makes the run exit non-zero.
+#
+#   python bench.py --save-baseline                 # record bench_baseline.json
+#   python bench.py --baseline bench_baseline.json  # compare, fail on regressions
+#
+# Metric names ending in "_per_s" are throughputs (higher is better); all
+# others are times (lower is better).
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import codec
+import engine
+from pool import ProcessEnginePool
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_import(runs):
+    # Cold start of a fresh interpreter, minus bare interpreter start: importing
+    # engine or report, and the first assessment, which builds (or bloads) the
+    # rule environment that the import alone no longer does
+    def timed(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    bare = statistics.median(timed("pass") for _ in range(runs))
+    with_engine = statistics.median(timed("import engine") for _ in range(runs))
+    first_assessment = statistics.median(timed("import engine; engine.infer_risk(0)") for _ in range(runs))
+    with_report = statistics.median(timed("import report") for _ in range(runs))
+    return {
+        "import_engine_s": max(with_engine - bare, 0.0),
+        "first_assessment_s": max(first_assessment - bare, 0.0),
+        "import_report_s": max(with_report - bare, 0.0),
+    }
+
+
+def bench_infer_risk(rounds):
+    # Latency of infer_risk over every input combination, several rounds each
+    combinations = [codec.unpack_inputs(index) for index in range(codec.TABLE_SIZE)]
+    samples = []
+    for _ in range(rounds):
+        for user_inputs in combinations:
+            start = time.perf_counter()
+            engine.infer_risk(user_inputs)
+            samples.append(time.perf_counter() - start)
+    return {
+        "infer_risk_p50_s": _percentile(samples, 0.50),
+        "infer_risk_p90_s": _percentile(samples, 0.90),
+        "infer_risk_p99_s": _percentile(samples, 0.99),
+    }
+
+
+def bench_reset(runs):
+    # env.reset() alone, each time clearing one assessed patient as infer_risk does
+    env = engine.create_environment()
+    user_inputs = codec.unpack_inputs(0)
+    total = 0.0
+    for _ in range(runs):
+        engine.evaluate(env, user_inputs)
+        start = time.perf_counter()
+        env.reset()
+        total += time.perf_counter() - start
+    return {"env_reset_s": total / runs}
+
+
+def bench_throughput(max_workers, patients):
+    combinations = [codec.unpack_inputs(index) for index in range(codec.TABLE_SIZE)]
+    inputs = [combinations[index % len(combinations)] for index in range(patients)]
+    results = {}
+
+    start = time.perf_counter()
+    for user_inputs in inputs:
+        engine.infer_risk(user_inputs)
+    results["throughput_serial_per_s"] = patients / (time.perf_counter() - start)
+
+    for workers in range(1, max_workers + 1):
+        with ProcessEnginePool(workers, chunk_size=max(1, patients // (workers * 4))) as pool:
+            pool.infer_risk_batch(combinations)  # warm the workers up
+            start = time.perf_counter()
+            pool.infer_risk_batch(inputs)
+            results[f"throughput_workers_{workers}_per_s"] = patients / (time.perf_counter() - start)
+    return results
+
+
+def bench_reports(count):
+    from report import generate_bulk_reports, generate_pdf_report
+
+    user_inputs = codec.unpack_inputs(codec.TABLE_SIZE - 1)
+    risk_level, explanation = engine.infer_risk(user_inputs)
+    assessment = {"inputs": user_inputs, "risk_level": risk_level, "explanation": explanation}
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        generate_pdf_report(assessment, os.path.join(directory, "single.pdf"))
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for index in range(count):
+            generate_pdf_report(assessment, os.path.join(directory, f"report_{index}.pdf"))
+        bulk = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_bulk_reports([assessment] * count, os.path.join(directory, "bulk"))
+        bulk_api = time.perf_counter() - start
+    return {
+        "report_single_s": single,
+        "report_bulk_per_s": count / bulk,
+        "report_bulk_api_per_s": count / bulk_api,
+    }
+
+
+def run(args):
+    metrics = {}
+    metrics.update(bench_import(args.import_runs))
+    metrics.update(bench_infer_risk(args.rounds))
+    metrics.update(bench_reset(args.reset_runs))
+    metrics.update(bench_throughput(args.workers, args.patients))
+    try:
+        metrics.update(bench_reports(args.reports))
+    except ImportError as e:
+        print(f"Skipping report benchmarks: {e}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(results, baseline, threshold):
+    # Lines describing each shared metric; regressions are flagged
+    lines = []
+    regressions = 0
+    for name, value in sorted(results["metrics"].items()):
+        if name not in baseline["metrics"]:
+            continue
+        old = baseline["metrics"][name]
+        if not old:
+            continue
+        change = (value - old) / old
+        if name.endswith("_per_s"):
+            change = -change
+        regressed = change > threshold
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{name:34} {old:12.6g} -> {value:12.6g}  {change:+7.1%} worse{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine, startup and report generation.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="where to write results")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", action="store_true", help="also write results to bench_baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (default: 0.2)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="measure throughput for 1..N workers")
+    parser.add_argument("--patients", type=int, default=20000, help="patients per throughput run")
+    parser.add_argument("--rounds", type=int, default=10, help="rounds over all 192 combinations for latency")
+    parser.add_argument("--reset-runs", type=int, default=5000, help="env.reset() calls to time")
+    parser.add_argument("--import-runs", type=int, default=5, help="cold imports to time")
+    parser.add_argument("--reports", type=int, default=100, help="reports in the bulk report run")
+    args = parser.parse_args(argv)
+
+    # Only warnings and errors while benchmarking
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    results = run(args)
+    for name, value in sorted(results["metrics"].items()):
+        print(f"{name:34} {value:12.6g}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open("bench_baseline.json", "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        for line in lines:
+            print(line)
+        if regressions:
+            print(f"{regressions} metric(s) regressed", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# codec.py
+#
+# Canonical form of the patient inputs. The input space is closed: three age
+# groups and six yes/no slots, 192 combinations in all. Every patient packs
+# into a one-byte code, the age group in the high bits and one bit per yes/no
+# slot in FLAG_SLOTS order, and that code is the key used everywhere: the
+# engine asserts patients from it, and the decision table, store, archive,
+# audit trail and caches are all indexed by it.
+#
+#   codec.encode({"age-group": "Old", "smoking": "Y", "exposure": False, ...})  # -> 160
+#   codec.unpack_inputs(160)  # -> {"age-group": "old", "smoking": "yes", ...}
+#
+# encode() accepts the usual spellings (yes/no, y/n, true/false, 1/0, bools,
+# any case and surrounding whitespace) and raises ValueError for anything
+# else; pack_inputs() is the lenient variant returning None. encode_columns()
+# and decode_codes() do the same for whole NumPy columns.
+
+import operator
+
+AGE_GROUPS = ("young", "middle", "old")
+FLAG_VALUES = ("no", "yes")
+FLAG_SLOTS = (
+    "smoking",
+    "exposure",
+    "breathing-issue",
+    "chest-tightness",
+    "family-history",
+    "long-term-illness",
+)
+INPUT_SLOTS = ("age-group",) + FLAG_SLOTS
+TABLE_SIZE = len(AGE_GROUPS) << len(FLAG_SLOTS)
+
+_AGE_CODES = {age: code for code, age in enumerate(AGE_GROUPS)}
+_FLAG_CODES = {
+    "no": 0, "n": 0, "false": 0, "f": 0, "0": 0,
+    "yes": 1, "y": 1, "true": 1, "t": 1, "1": 1,
+}
+
+# Decoded inputs of every code, copied on the way out
+_DECODED = tuple(
+    {"age-group": AGE_GROUPS[code >> len(FLAG_SLOTS)], **{
+        slot: FLAG_VALUES[code >> (len(FLAG_SLOTS) - 1 - position) & 1]
+        for position, slot in enumerate(FLAG_SLOTS)
+    }}
+    for code in range(TABLE_SIZE)
+)
+
+
+def _flag_code(slot, value):
+    if isinstance(value, (bool, int)) and value in (0, 1):
+        return int(value)
+    code = _FLAG_CODES.get(str(value).strip().lower())
+    if code is None:
+        raise ValueError(f"invalid value {value!r} for slot '{slot}'")
+    return code
+
+
+def _age_code(value):
+    code = _AGE_CODES.get(str(value).strip().lower())
+    if code is None:
+        raise ValueError(f"invalid value {value!r} for slot 'age-group'")
+    return code
+
+
+def encode(user_inputs):
+    # Validate the seven input slots and pack them into a code; raises
+    # ValueError naming the first missing or invalid slot. A code (any
+    # integer type, NumPy's included) passes through once range-checked.
+    if not isinstance(user_inputs, dict):
+        if isinstance(user_inputs, bool):
+            raise ValueError(f"expected the input slots as a dict, got {type(user_inputs).__name__}")
+        try:
+            code = operator.index(user_inputs)
+        except TypeError:
+            raise ValueError(f"expected the input slots as a dict, got {type(user_inputs).__name__}") from None
+        if not 0 <= code < TABLE_SIZE:
+            raise ValueError(f"input code {code} out of range")
+        return code
+    try:
+        # Fast path: already canonical
+        code = _AGE_CODES[user_inputs["age-group"]]
+        for slot in FLAG_SLOTS:
+            code = (code << 1) | _FLAG_CODES[user_inputs[slot]]
+        return code
+    except (KeyError, TypeError):
+        pass
+
+    for slot in INPUT_SLOTS:
+        if user_inputs.get(slot) is None:
+            raise ValueError(f"missing slot '{slot}'")
+    code = _age_code(user_inputs["age-group"])
+    for slot in FLAG_SLOTS:
+        code = (code << 1) | _flag_code(slot, user_inputs[slot])
+    return code
+
+
+def pack_inputs(user_inputs):
+    # encode(), or None if the inputs are outside the engine's domain
+    try:
+        return encode(user_inputs)
+    except ValueError:
+        return None
+
+
+def unpack_inputs(code):
+    # Canonical inputs for a code, as a new dict
+    return dict(_DECODED[code])
+
+
+def normalize(user_inputs):
+    # The canonical seven slots of user_inputs; raises ValueError like encode()
+    return unpack_inputs(encode(user_inputs))
+
+
+# Columns
+
+def _column_codes(slot, column, lookup):
+    # Map a column of names through lookup by its distinct values; integer
+    # (or boolean) columns are taken as codes already and only range-checked
+    import numpy as np
+
+    column = np.asarray(column)
+    if column.dtype.kind in "biu":
+        invalid = (column < 0) | (column > max(lookup.values()))
+        if invalid.any():
+            row = int(np.flatnonzero(invalid)[0])
+            raise ValueError(f"row {row}: invalid value {int(column[row])!r} for slot '{slot}'")
+        return column.astype(np.uint8)
+
+    values, inverse = np.unique(column.astype(str), return_inverse=True)
+    mapped = np.empty(len(values), dtype=np.uint8)
+    for position, value in enumerate(values):
+        code = lookup.get(value.strip().lower())
+        if code is None:
+            row = int(np.flatnonzero(inverse == position)[0])
+            raise ValueError(f"row {row}: invalid value {str(value)!r} for slot '{slot}'")
+        mapped[position] = code
+    return mapped[inverse.reshape(-1)]
+
+
+def encode_columns(columns):
+    """Vectorized encode(): columns maps each input slot to an array.
+
+    The age-group column holds age group names or AGE_GROUPS indices; the
+    yes/no columns hold strings in any accepted spelling, or booleans/0-1
+    integers. Returns a uint8 array of codes; raises ValueError naming the
+    first invalid row.
+    """
+    for slot in INPUT_SLOTS:
+        if slot not in columns:
+            raise ValueError(f"missing slot '{slot}'")
+    codes = _column_codes("age-group", columns["age-group"], _AGE_CODES)
+    for slot in FLAG_SLOTS:
+        codes = (codes << 1) | _column_codes(slot, columns[slot], _FLAG_CODES)
+    return codes
+
+
+def decode_codes(codes):
+    # Vectorized inverse: (age group index array, [six boolean flag arrays])
+    import numpy as np
+
+    codes = np.asarray(codes, dtype=np.uint8)
+    width = len(FLAG_SLOTS)
+    flags = [(codes >> (width - 1 - position) & 1).astype(bool) for position in range(width)]
+    return codes >> width, flags
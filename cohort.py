@@ -0,0 +1,165 @@
+# cohort.py
+#
+# Cohort summary reports. Assessments are streamed from a scored CSV/JSONL
+# file, the SQLite store or a binary archive and folded into a CohortSummary
+# in one pass. Every assessment is counted under its (input combination, risk
+# level, explanation), so memory is bounded by the 192 input combinations and
+# the handful of distinct results, not by the cohort size. The distributions
+# in the report are all derived from those counts; the store and archive
+# hand them over already aggregated.
+#
+#   python batch_score.py week.csv | python cohort.py -o cohort.pdf
+#   python cohort.py --store assessments.db --since 2026-10-12 --until 2026-10-19
+#   python cohort.py --archive assessments.lrar --title "Screening programme 2026"
+
+import argparse
+import logging
+import sys
+from collections import Counter
+
+import codec
+import engine
+from batch_score import (
+    ErrorChannel, _detect_format, _open, read_records, score_records, score_serial, valid_records,
+)
+
+RISK_LEVELS = ("low", "medium", "high")
+
+
+class CohortSummary:
+    """Constant-memory aggregate of any number of assessments."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, user_inputs, risk_level, explanation, count=1):
+        code = codec.encode(user_inputs)
+        self.counts[(code, str(risk_level), str(explanation))] += count
+
+    def add_counts(self, counts):
+        # {(input_code, risk_level, explanation): count}, e.g. from
+        # AssessmentStore.result_counts() or ArchiveReader.combination_counts()
+        for (code, risk_level, explanation), count in counts.items():
+            self.counts[(code, str(risk_level), str(explanation))] += count
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def risk_levels(self):
+        # Levels present, known ones in increasing order first
+        present = {risk_level for _, risk_level, _ in self.counts}
+        return [level for level in RISK_LEVELS if level in present] + sorted(present - set(RISK_LEVELS))
+
+    def risk_by_age(self):
+        # {age group: Counter(risk level)}
+        table = {age: Counter() for age in codec.AGE_GROUPS}
+        for (code, risk_level, _), count in self.counts.items():
+            table[codec.AGE_GROUPS[code >> len(codec.FLAG_SLOTS)]][risk_level] += count
+        return table
+
+    def factor_prevalence(self):
+        # {flag slot: Counter with "all" and each risk level}: patients with the
+        # factor; divide by the matching totals for prevalence
+        prevalence = {slot: Counter() for slot in codec.FLAG_SLOTS}
+        for (code, risk_level, _), count in self.counts.items():
+            for position, slot in enumerate(codec.FLAG_SLOTS):
+                if code >> (len(codec.FLAG_SLOTS) - 1 - position) & 1:
+                    prevalence[slot]["all"] += count
+                    prevalence[slot][risk_level] += count
+        return prevalence
+
+    def level_totals(self):
+        totals = Counter()
+        for (_, risk_level, _), count in self.counts.items():
+            totals[risk_level] += count
+        return totals
+
+    def explanations(self):
+        # [(rule, risk level, explanation, count)], most frequent first. The rule
+        # is looked up from the current rule set; "-" if no rule gives it.
+        rules = {explanation: name for name, _, _, explanation in engine.rule_summaries()}
+        totals = Counter()
+        for (_, risk_level, explanation), count in self.counts.items():
+            totals[(risk_level, explanation)] += count
+        return [
+            (rules.get(explanation, "-"), risk_level, explanation, count)
+            for (risk_level, explanation), count in totals.most_common()
+        ]
+
+
+def summarize(assessments, summary=None):
+    # Fold (user_inputs, risk_level, explanation) triples into summary
+    summary = summary or CohortSummary()
+    for user_inputs, risk_level, explanation in assessments:
+        summary.add(user_inputs, risk_level, explanation)
+    return summary
+
+
+def _require_results(rows):
+    # Mark rows without a result as errors, so valid_records reports them
+    for line_number, record, error in rows:
+        if error is None and not (record.get("risk-level") and record.get("explanation")):
+            error = "record has no risk-level/explanation (use --score)"
+        yield line_number, record, error
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise a cohort of assessments into one PDF report.")
+    parser.add_argument("input", nargs="?", default="-", help="scored CSV or JSONL file (default: stdin)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from extension, else csv)")
+    parser.add_argument("--score", action="store_true", help="score the input records instead of reading results")
+    parser.add_argument("--store", help="summarise this SQLite assessment store instead of a file")
+    parser.add_argument("--since", help="with --store: assessments at or after this time")
+    parser.add_argument("--until", help="with --store: assessments before this time")
+    parser.add_argument("--archive", help="summarise this binary archive instead of a file")
+    parser.add_argument("--errors", help="write rejected rows here as JSONL (default: stderr)")
+    parser.add_argument("--title", default="Cohort Risk Summary", help="report title")
+    parser.add_argument("-o", "--output", default="cohort_report.pdf", help="PDF to write (default: cohort_report.pdf)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    summary = CohortSummary()
+    subtitle = args.input
+    errors = None
+    if args.store:
+        from store import AssessmentStore
+
+        with AssessmentStore(args.store) as store:
+            summary.add_counts(store.result_counts(since=args.since, until=args.until))
+        period = " to ".join(filter(None, (args.since, args.until)))
+        subtitle = f"{args.store}, {period}" if period else args.store
+    elif args.archive:
+        from archive import ArchiveReader
+
+        summary.add_counts(ArchiveReader(args.archive).combination_counts())
+        subtitle = args.archive
+    else:
+        source = _open(args.input, "r")
+        error_stream = _open(args.errors, "w") if args.errors else sys.stderr
+        errors = ErrorChannel(error_stream)
+        try:
+            rows = read_records(source, args.format or _detect_format(args.input))
+            if args.score:
+                scored = score_records(valid_records(rows, errors), lambda inputs: score_serial(inputs, 1000))
+                assessments = ((codec.normalize(r), r["risk-level"], r["explanation"]) for r in scored)
+            else:
+                assessments = ((inputs, record["risk-level"], record["explanation"])
+                               for record, inputs in valid_records(_require_results(rows), errors))
+            summarize(assessments, summary)
+        finally:
+            for stream in (source, error_stream):
+                if stream not in (sys.stdin, sys.stderr):
+                    stream.close()
+
+    from report import generate_cohort_report
+
+    generate_cohort_report(summary, args.output, title=args.title, source=subtitle)
+    rejected = f", rejected {errors.count}" if errors is not None else ""
+    print(f"Summarised {summary.total} assessments{rejected} into {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,351 +1,222 @@
 # engine.py
 import clips
+import collections
+import hashlib
+import itertools
 import logging
+import os
+import re
+import threading
+import time
+
+from codec import AGE_GROUPS, FLAG_VALUES, INPUT_SLOTS, TABLE_SIZE, encode, unpack_inputs
+from metrics import EngineMetrics
+
+# Rule source
+#
+# rules.clp is the source of truth for the rule set. It is split into its
+# top-level constructs at import, and reload_rules() re-reads it at run time.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.path.join(BASE_DIR, "rules.clp")
+
+_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|;[^\n]*|[()]|[^"();]+')
+
+
+class RuleSetError(Exception):
+    pass
 
-# Create global environment
-logging.basicConfig(level=logging.INFO,format='%(message)s')
-env = clips.Environment()
-router = clips.LoggingRouter()
-env.add_router(router)
-
-# templates
-env.build("""
-(deftemplate patient
-  (slot age-group)
-  (slot smoking)
-  (slot exposure)
-  (slot breathing-issue)
-  (slot chest-tightness)
-  (slot family-history)
-  (slot long-term-illness)
-)
-""")
 
-env.build("""
-(deftemplate risk-assessment
-  (slot risk-level)
-  (slot explanation)
-)
-""")
-
-# Build Rules
-
-# High risk 
-
-# H1: smoker + breathing issue + chest tightness 
-env.build("""
-(defrule high-risk-1
-  (declare (salience 40))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (smoking yes)
-           (breathing-issue yes)
-           (chest-tightness yes))
-=>
-  (assert (risk-assessment
-    (risk-level high)
-    (explanation "High risk based on smoking and severe respiratory symptoms. Please seek immediate medical consultation.")))
-)
-""")
-
-# H2: Exposure + long-term illness + breathing issue
-env.build("""
-(defrule high-risk-2
-  (declare (salience 40))
-  (not (risk-assessment (risk-level ?)))
-  (patient (exposure yes)
-           (long-term-illness yes)
-           (breathing-issue yes))
-=>
-  (assert (risk-assessment
-    (risk-level high)
-    (explanation "High risk with exposure plus chronic illness and breathing issues. Specialist consultation is recommended.")))
-)
-""")
-
-# H3: Older + both symptoms (even if risks unknown)
-env.build("""
-(defrule high-risk-3
-  (declare (salience 39))
-  (not (risk-assessment (risk-level ?)))
-  (patient (age-group old)
-           (breathing-issue yes)
-           (chest-tightness yes))
-=>
-  (assert (risk-assessment
-    (risk-level high)
-    (explanation "High risk based on older age with significant respiratory symptoms. Urgent medical evaluation is advised.")))
-)
-""")
-
-# H4: Severe symptoms + at least TWO major risk factors
-env.build("""
-(defrule high-risk-4
-  (declare (salience 38))
-  (not (risk-assessment (risk-level ?)))
-  (patient (breathing-issue yes)
-           (chest-tightness yes)
-           (smoking ?s)
-           (exposure ?e)
-           (family-history ?f)
-           (long-term-illness ?ill))
-  (test (>= (+ (if (eq ?s yes) then 1 else 0)
-               (if (eq ?e yes) then 1 else 0)
-               (if (eq ?f yes) then 1 else 0)
-               (if (eq ?ill yes) then 1 else 0)) 2))
-=>
-  (assert (risk-assessment
-    (risk-level high)
-    (explanation "High risk: severe symptoms with multiple risk factors. Seek medical assessment as soon as possible.")))
-)
-""")
-
-# Medium Risk
-
-# M1: respiratory symptoms but non-smoker
-env.build("""
-(defrule medium-risk-1
-  (declare (salience 30))
-  (not (risk-assessment (risk-level ?)))
-  (patient (breathing-issue ?b)
-           (chest-tightness ?c))
-  (test (or (eq ?b yes) (eq ?c yes)))
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Moderate risk due to respiratory symptoms even without smoking history. You should consult a healthcare professional.")))
-)
-""")
-
-# M2: smoker only
-env.build("""
-(defrule medium-risk-2
-  (declare (salience 26))
-  (not (risk-assessment (risk-level ?)))
-  (patient (smoking yes)
-           (breathing-issue no)
-           (chest-tightness no)
-           (exposure no)
-           (family-history no)
-           (long-term-illness no))
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Moderate risk: smoking increases long-term lung disease risk even without symptoms. Quitting and periodic check-ups are advised.")))
-)
-""")
-
-# M3: family history + some exposure, but no strong current symptoms
-env.build("""
-(defrule medium-risk-3
-  (declare (salience 25))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (family-history yes)
-           (exposure yes)
-           (breathing-issue no)
-           (chest-tightness no))
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Moderate risk because of family history and environmental exposure. Consider screening and monitoring of symptoms.")))
-)
-""")
-
-# M4: No symptoms, but TWO or more risk factors
-env.build("""
-(defrule medium-risk-4
-  (declare (salience 28))
-  (not (risk-assessment (risk-level ?)))
-  (patient (breathing-issue no)
-           (chest-tightness no)
-           (smoking ?s)
-           (exposure ?e)
-           (family-history ?f)
-           (long-term-illness ?ill))
-  (test (>= (+ (if (eq ?s yes) then 1 else 0)
-               (if (eq ?e yes) then 1 else 0)
-               (if (eq ?f yes) then 1 else 0)
-               (if (eq ?ill yes) then 1 else 0)) 2))
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Moderate risk: multiple risk factors even without symptoms. Consider screening and lifestyle risk reduction.")))
-)
-""")
-
-# M5: chest tightness alone with at least one risk factor
-env.build("""
-(defrule medium-risk-5
-  (declare (salience 22))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (breathing-issue no)
-           (chest-tightness yes)
-           (smoking ?s)
-           (exposure ?e)
-           (family-history ?f)
-           (long-term-illness ?ill))
-  (test (or (eq ?s yes)
-            (eq ?e yes)
-            (eq ?f yes)
-            (eq ?ill yes)))
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Moderate risk due to chest discomfort combined with at least one risk factor. A check-up is recommended.")))
-)
-""")
-
-# M6: Older + at least one risk factor (even without symptoms)
-env.build("""
-(defrule medium-risk-6
-  (declare (salience 27))
-  (not (risk-assessment (risk-level ?)))
-  (patient (age-group old)
-           (breathing-issue no)
-           (chest-tightness no)
-           (smoking ?s)
-           (exposure ?e)
-           (family-history ?f)
-           (long-term-illness ?ill))
-  (test (>= (+ (if (eq ?s yes) then 1 else 0)
-               (if (eq ?e yes) then 1 else 0)
-               (if (eq ?f yes) then 1 else 0)
-               (if (eq ?ill yes) then 1 else 0)) 1))
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Moderate risk: older age with at least one risk factor. Regular monitoring and screening are recommended.")))
-)
-""")
-
-# Low Risk
-
-# L1: no smoking, no major symptoms, no family history
-env.build("""
-(defrule low-risk-1
-  (declare (salience 15))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (smoking no)
-           (exposure no)
-           (long-term-illness no)
-           (breathing-issue no)
-           (chest-tightness no)
-           (family-history no))
-=>
-  (assert (risk-assessment
-    (risk-level low)
-    (explanation "Low risk as no symptoms and no major risk factors reported. Maintain a healthy lifestyle and routine check-ups.")))
-)
-""")
-
-# L2: young non-smoker, no exposure, no long-term illness
-env.build("""
-(defrule low-risk-2
-  (declare (salience 15))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (age-group young)
-           (smoking no)
-           (exposure no)
-           (breathing-issue no)
-           (chest-tightness no)
-           (long-term-illness no))
-=>
-  (assert (risk-assessment
-    (risk-level low)
-    (explanation "Low current risk. Continue avoiding smoking and high pollution exposure to keep your lungs healthy.")))
-)
-""")
-
-# L3: middle age non-smoker, no exposure, no family history, no long-term illness, no symptoms
-env.build("""
-(defrule low-risk-3
-  (declare (salience 15))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (age-group middle)
-           (smoking no)
-           (exposure no)
-           (family-history no)
-           (long-term-illness no)
-           (breathing-issue no)
-           (chest-tightness no))
-=>
-  (assert (risk-assessment
-    (risk-level low)
-    (explanation "Low risk profile. Maintaining current habits and periodic health checks is recommended.")))
-)
-""")
-
-# L4: mild single risk factor without symptoms (family history only)
-env.build("""
-(defrule low-risk-4
-  (declare (salience 12))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (smoking no)
-           (exposure no)
-           (breathing-issue no)
-           (chest-tightness no)
-           (long-term-illness no)
-           (family-history yes))
-=>
-  (assert (risk-assessment
-    (risk-level low)
-    (explanation "Currently low symptom burden but with family history. Staying alert for new symptoms and regular screening is advised.")))
-)
-""")
-
-# L4: single weak factor
-env.build("""
-(defrule low-risk-5
-  (declare (salience 14))
-  (not (risk-assessment (risk-level ?l)))
-  (patient (breathing-issue no)
-           (chest-tightness no)
-           (smoking ?s)
-           (exposure ?e)
-           (family-history ?f)
-           (long-term-illness ?ill))
-  (test (<= (+ (if (eq ?s yes) then 1 else 0)
-               (if (eq ?e yes) then 1 else 0)
-               (if (eq ?f yes) then 1 else 0)
-               (if (eq ?ill yes) then 1 else 0)) 1))
-=>
-  (assert (risk-assessment
-    (risk-level low)
-    (explanation "Low overall risk with at most one minor risk factor and no symptoms.")))
-)
-""")
-
-# Default rule: if no specific rule fired
-env.build("""
-(defrule default-risk
-  (declare (salience 0))
-  (not (risk-assessment (risk-level ?level)))
-  (patient)
-=>
-  (assert (risk-assessment
-    (risk-level medium)
-    (explanation "Insufficient pattern detected. Defaulting to MEDIUM risk as a precaution. Please consult a healthcare professional.")))
-)
-""")
+def parse_constructs(text):
+    # Split CLIPS source into top-level constructs, dropping ; comments
+    constructs = []
+    current = []
+    depth = 0
+    for match in _TOKENS.finditer(text):
+        token = match.group()
+        if token.startswith(";"):
+            continue
+        if depth == 0 and token != "(":
+            if token.strip():
+                raise RuleSetError(f"Unexpected text outside a construct: {token.strip()[:40]!r}")
+            continue
+        current.append(token)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+            if depth == 0:
+                constructs.append("".join(current))
+                current = []
+    if depth:
+        raise RuleSetError("Unbalanced parentheses in rule source")
+    return constructs
+
+
+def read_constructs(path=RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return parse_constructs(f.read())
+
 
+def rule_summaries(constructs=None):
+    # (name, salience, risk level, explanation) for each defrule, in definition
+    # order, from the current rule set by default
+    rules = []
+    for construct in CONSTRUCTS if constructs is None else constructs:
+        name = re.search(r"\(defrule\s+(?:MAIN::)?(\S+)", construct)
+        if name is None:
+            continue
+        salience = re.search(r"\(salience\s+(-?\d+)\)", construct)
+        rhs = construct.split("=>", 1)[1]
+        level = re.search(r"\(risk-level\s+(\w+)\)", rhs).group(1)
+        explanation = re.search(r'\(explanation\s+"((?:[^"\\]|\\.)*)"\)', rhs).group(1)
+        rules.append((name.group(1), int(salience.group(1)) if salience else 0, level, explanation))
+    return rules
+
+
+# Rule set currently in use, built into every environment by create_environment()
+CONSTRUCTS = read_constructs()
+
+# Binary rule image
+#
+# Running this module as a script is the build step: it writes a CLIPS binary
+# image (bsave) of the constructs, stamped with the hash of their sources.
+# create_environment() bloads the image when the stamp matches and builds from
+# source otherwise. Importing never writes to disk.
+
+IMAGE_PATH = os.path.join(BASE_DIR, "rules.bin")
+IMAGE_STAMP_PATH = IMAGE_PATH + ".sha256"
 
-def infer_risk(user_inputs):
 
-    env.reset()
+def ruleset_fingerprint(constructs=None):
+    # Hash of the rule set sources (the current ones by default)
+    digest = hashlib.sha256()
+    for construct in CONSTRUCTS if constructs is None else constructs:
+        digest.update(construct.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _clips_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _image_is_current():
+    try:
+        with open(IMAGE_STAMP_PATH, encoding="utf-8") as stamp:
+            return stamp.read().strip() == ruleset_fingerprint()
+    except OSError:
+        return False
+
+
+def _new_environment():
+    environment = clips.Environment()
+    environment.add_router(clips.LoggingRouter())
+    return environment
+
+
+def _build_from_source(constructs=None):
+    environment = _new_environment()
+    for construct in CONSTRUCTS if constructs is None else constructs:
+        environment.build(construct)
+    return environment
+
+
+def build_environment(path=RULES_PATH):
+    # Fresh environment with the rules in path, independent of the live rules
+    return _build_from_source(read_constructs(path))
+
+
+def create_environment():
+    # Build a fresh CLIPS environment with the templates and rules loaded,
+    # from the binary image when it is current
+    if _image_is_current():
+        environment = _new_environment()
+        if environment.eval(f"(bload {_clips_string(IMAGE_PATH)})") == "TRUE":
+            return environment
+        logging.warning("Could not load rule image %s, building from source", IMAGE_PATH)
+    return _build_from_source()
+
+
+def build_image():
+    # Write the binary image of the current rule set and its stamp
+    environment = _build_from_source()
+
+    tmp_path = IMAGE_PATH + ".tmp"
+    if environment.eval(f"(bsave {_clips_string(tmp_path)})") != "TRUE":
+        raise RuntimeError(f"Failed to write rule image {tmp_path}")
+    os.replace(tmp_path, IMAGE_PATH)
+
+    with open(IMAGE_STAMP_PATH + ".tmp", "w", encoding="utf-8") as stamp:
+        stamp.write(ruleset_fingerprint() + "\n")
+    os.replace(IMAGE_STAMP_PATH + ".tmp", IMAGE_STAMP_PATH)
+
+
+# Global environment, shared by infer_risk under a lock. It is built on first
+# use rather than at import, so importing engine stays cheap for tools that
+# never run the rules. A reload swaps in a new (environment, lock) pair in one
+# assignment; calls that already picked up the old pair finish on it.
+_active = None
+
+
+def _engine():
+    # The shared (environment, lock) pair, created on first call
+    global _active
+    active = _active
+    if active is None:
+        with _reload_lock:
+            if _active is None:
+                _active = (create_environment(), threading.Lock())
+            active = _active
+    return active
 
-    fact_str = f"""(patient
-      (age-group {user_inputs['age-group']})
-      (smoking {user_inputs['smoking']})
-      (exposure {user_inputs['exposure']})
-      (breathing-issue {user_inputs['breathing-issue']})
-      (chest-tightness {user_inputs['chest-tightness']})
-      (family-history {user_inputs['family-history']})
-      (long-term-illness {user_inputs['long-term-illness']})
-    )"""
-
-    logging.info("Asserting fact: %s", fact_str.strip())
-    env.assert_string(fact_str)
-    env.run()
 
+def __getattr__(name):
+    # engine.env: the current global environment
+    if name == "env":
+        return _engine()[0]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Instrumentation: off by default, see metrics.py
+metrics = EngineMetrics()
+
+# Audit trail: when set (see audit.py), every assessment is handed to this
+# log with its deciding rule and timing; it must return immediately
+_audit = None
+
+
+def set_audit(log):
+    # Install log (None to stop auditing); returns the previous one
+    global _audit
+    previous, _audit = _audit, log
+    return previous
+
+
+# Shadow evaluation: when set (see shadow.py), every live result is offered to
+# this observer after it has been computed; it must return immediately
+_shadow = None
+
+
+def set_shadow(observer):
+    # Install observer (None to stop shadowing); returns the previous one
+    global _shadow
+    previous, _shadow = _shadow, observer
+    return previous
+
+
+# Slot values of the patient fact for every input code, built once. Patients
+# are asserted from their code, so only these symbols ever reach CLIPS.
+_PATIENT_SLOTS = tuple(
+    {slot: clips.Symbol(value) for slot, value in unpack_inputs(code).items()} for code in range(TABLE_SIZE)
+)
+
+
+def _assert_patient(env, code, **slots):
+    # Assert a patient through the template API: no fact string to format or parse
+    return env.find_template("patient").assert_fact(**_PATIENT_SLOTS[code], **slots)
+
+
+def _collect(env):
     risk_level = "unknown"
     explanation = "No result."
 
@@ -355,8 +226,569 @@ def infer_risk(user_inputs):
             explanation = fact["explanation"]
             break
 
-    logging.info("Inference result: %s - %s", risk_level, explanation)
     return risk_level, explanation
 
-# Save the current environment to a .clp file 
-env.save("rules.clp")
+
+def fired_rule(env):
+    # Name of the rule at the head of the agenda, i.e. the one run() fires
+    # first. Every rule is guarded by (not (risk-assessment ...)), so after a
+    # single patient is asserted this is the rule that decides the assessment;
+    # no watch output through the LoggingRouter is needed.
+    for activation in env.activations():
+        return activation.name
+    return None
+
+
+def evaluate(env, user_inputs):
+    # Run one patient (inputs dict or input code) through the rule set and
+    # return the assessment; raises ValueError for inputs outside the domain
+    if metrics.enabled:
+        return _evaluate_profiled(env, user_inputs)[1:]
+    return _evaluate(env, encode(user_inputs))
+
+
+def _evaluate(env, code):
+    # evaluate() left out of metrics, for the engine's own runs over the rules
+    env.reset()
+    _assert_patient(env, code)
+    env.run()
+    return _collect(env)
+
+
+def evaluate_traced(env, user_inputs):
+    # evaluate() that also names the deciding rule: (rule, risk_level, explanation)
+    env.reset()
+    _assert_patient(env, encode(user_inputs))
+    rule = fired_rule(env)
+    env.run()
+    return (rule,) + _collect(env)
+
+
+def _evaluate_profiled(env, user_inputs):
+    # evaluate_traced() with per-phase timings and the fired rule recorded in metrics
+    start = time.perf_counter()
+    env.reset()
+    reset_done = time.perf_counter()
+    _assert_patient(env, encode(user_inputs))
+    rule = fired_rule(env)
+    assert_done = time.perf_counter()
+    env.run()
+    run_done = time.perf_counter()
+    risk_level, explanation = _collect(env)
+    end = time.perf_counter()
+
+    metrics.record({
+        "reset": reset_done - start,
+        "assert": assert_done - reset_done,
+        "run": run_done - assert_done,
+        "collect": end - run_done,
+        "total": end - start,
+    }, [rule] if rule else ())
+    return rule, risk_level, explanation
+
+
+def infer_risk(user_inputs, ruleset=None):
+    # ruleset names a registered rule set ("name" or "name@version", see
+    # RuleSetRegistry) to score with instead of the live rules. Raises
+    # ValueError for inputs outside the engine's domain.
+    code = encode(user_inputs)
+    if ruleset is not None:
+        ruleset = registry.resolve(ruleset)
+
+    audit = _audit
+    if audit is not None:
+        start = time.perf_counter()
+
+    result = None
+    rule = None
+    table = _decision_table if ruleset is None else None
+    if table is not None:
+        if metrics.enabled:
+            metrics.count("decision_table_hits")
+        result = table[code]
+
+    if result is None:
+        environment, lock = _engine() if ruleset is None else registry.environment(ruleset)
+        with lock:
+            if audit is None:
+                result = evaluate(environment, code)
+            else:
+                trace = _evaluate_profiled if metrics.enabled else evaluate_traced
+                rule, *result = trace(environment, code)
+                result = tuple(result)
+
+    if audit is not None:
+        audit.record(code, result, rule, time.perf_counter() - start, ruleset=ruleset)
+    shadow = _shadow
+    if shadow is not None and ruleset is None:
+        shadow.offer(code, result)
+    return result
+
+
+def evaluate_batch(env, inputs, rules=None):
+    # Assert every patient (inputs dict or code) under its position as id, run
+    # the agenda once and index the assessments by id. A list passed as rules
+    # is extended with the deciding rule of each patient.
+    return _evaluate_batch(env, inputs, rules, metrics.enabled)
+
+
+def _evaluate_batch(env, inputs, rules=None, profiled=False):
+    if profiled:
+        start = time.perf_counter()
+
+    env.reset()
+    if profiled:
+        reset_done = time.perf_counter()
+
+    facts = {}
+    for patient_id, patient in enumerate(inputs):
+        facts[_assert_patient(env, encode(patient), id=patient_id).index] = patient_id
+    if profiled or rules is not None:
+        fired = _fired_rules_by_fact(env)
+        if rules is not None:
+            rules.extend(fired.get(index) for index in facts)
+    if profiled:
+        assert_done = time.perf_counter()
+
+    env.run()
+    if profiled:
+        run_done = time.perf_counter()
+
+    results = {}
+    for fact in env.find_template("risk-assessment").facts():
+        results[fact["id"]] = (fact["risk-level"], fact["explanation"])
+
+    assessments = [results.get(patient_id, ("unknown", "No result.")) for patient_id in range(len(inputs))]
+
+    if profiled:
+        end = time.perf_counter()
+        metrics.record({
+            "batch_reset": reset_done - start,
+            "batch_assert": assert_done - reset_done,
+            "batch_run": run_done - assert_done,
+            "batch_collect": end - run_done,
+            "batch_total": end - start,
+        }, [fired[index] for index in facts if index in fired])
+        metrics.count("batch_patients", len(inputs))
+    return assessments
+
+
+_ACTIVATION_FACT = re.compile(r": f-(\d+)")
+
+
+def _fired_rules_by_fact(env):
+    # {patient fact index: first agenda entry for it}, the rule that will decide it
+    fired = {}
+    for activation in env.activations():
+        match = _ACTIVATION_FACT.search(str(activation))
+        if match:
+            fired.setdefault(int(match.group(1)), activation.name)
+    return fired
+
+
+def infer_risk_batch(inputs, ruleset=None):
+    # Score many patients with a single reset and run; results follow input
+    # order. Raises ValueError naming the first patient outside the domain.
+    codes = []
+    for position, user_inputs in enumerate(inputs):
+        try:
+            codes.append(encode(user_inputs))
+        except ValueError as e:
+            raise ValueError(f"patient {position}: {e}") from None
+    if ruleset is not None:
+        ruleset = registry.resolve(ruleset)
+
+    audit = _audit
+    if audit is None:
+        results = _score_batch(codes, ruleset=ruleset)
+    else:
+        start = time.perf_counter()
+        rules = [None] * len(codes)
+        results = _score_batch(codes, rules, ruleset)
+        audit.record_batch(codes, results, rules, time.perf_counter() - start, ruleset=ruleset)
+
+    shadow = _shadow
+    if shadow is not None and ruleset is None:
+        shadow.offer_many(codes, results)
+    return results
+
+
+def _score_batch(codes, rules=None, ruleset=None):
+    # rules, if given, is a list as long as codes that receives the deciding
+    # rule of every patient the engine ran (decision-table hits stay None)
+    if ruleset is None:
+        environment, lock = _engine()
+        table = _decision_table
+    else:
+        environment, lock = registry.environment(ruleset)
+        table = None
+    if table is not None:
+        if metrics.enabled:
+            metrics.count("decision_table_hits", len(codes))
+        return [table[code] for code in codes]
+
+    fired = [] if rules is not None else None
+    with lock:
+        results = evaluate_batch(environment, codes, fired)
+    if rules is not None:
+        rules[:] = fired
+    return results
+
+
+# Decision table
+#
+# The input space is closed: every patient packs into one of 192 input codes
+# (see codec.py), so the whole rule set can be run once and infer_risk served
+# from a flat table indexed by code. Opt-in via enable_decision_table() or the
+# ENGINE_DECISION_TABLE environment variable.
+
+_decision_table = None
+_decision_table_fingerprint = None
+
+
+def _build_decision_table(environment):
+    return [_evaluate(environment, code) for code in range(TABLE_SIZE)]
+
+
+def ruleset_table(path=None):
+    # (risk_level, explanation) for every input combination under the rules in
+    # path (the current rule set by default), indexed by input code. Runs in
+    # an environment of its own and is neither audited nor counted in metrics.
+    environment = _build_from_source() if path is None else build_environment(path)
+    return _evaluate_batch(environment, range(TABLE_SIZE))
+
+
+def enable_decision_table():
+    # Run every input combination through the rule set and serve infer_risk from the result
+    global _decision_table, _decision_table_fingerprint
+    environment, lock = _engine()
+    with lock:
+        _decision_table = _build_decision_table(environment)
+    _decision_table_fingerprint = ruleset_fingerprint()
+
+
+def disable_decision_table():
+    global _decision_table, _decision_table_fingerprint
+    _decision_table = None
+    _decision_table_fingerprint = None
+
+
+def refresh_decision_table():
+    # Rebuild the table if the rule set changed since it was built; call after editing rules
+    if _decision_table is not None and _decision_table_fingerprint != ruleset_fingerprint():
+        enable_decision_table()
+
+
+# What-if analysis
+#
+# Which single change (quit smoking, remove exposure, ...) would move the risk
+# level? what_if() asserts the patient once and then edits slots on the live
+# fact, retracting only the derived risk-assessment before re-running the
+# agenda, so each scenario costs one modify and one run instead of a reset and
+# a parsed assert. With the decision table enabled every scenario is a lookup.
+
+def what_if_scenarios(user_inputs, pairs=False):
+    # Every one-slot change to user_inputs, plus every two-slot change with
+    # pairs, as {slot: new value} dicts
+    options = []
+    for slot in INPUT_SLOTS:
+        values = AGE_GROUPS if slot == "age-group" else FLAG_VALUES
+        options.append([(slot, value) for value in values if value != user_inputs[slot]])
+
+    scenarios = [dict([change]) for changes in options for change in changes]
+    if pairs:
+        for first, second in itertools.combinations(options, 2):
+            scenarios.extend(dict(changes) for changes in itertools.product(first, second))
+    return scenarios
+
+
+def evaluate_what_if(env, user_inputs, scenarios):
+    # Base assessment and one (changes, risk_level, explanation) per scenario
+    code = encode(user_inputs)
+    user_inputs = unpack_inputs(code)
+    env.reset()
+    patient = _assert_patient(env, code)
+    assessments = env.find_template("risk-assessment")
+    env.run()
+    base = _collect(env)
+
+    results = []
+    previous = {}
+    for changes in scenarios:
+        # Undo the previous scenario's changes that this one doesn't repeat
+        slots = {slot: user_inputs[slot] for slot in previous if slot not in changes}
+        slots.update(changes)
+        for fact in list(assessments.facts()):
+            fact.retract()
+        patient.modify_slots(**{slot: clips.Symbol(value) for slot, value in slots.items()})
+        env.run()
+        results.append((changes,) + _collect(env))
+        previous = changes
+    return base, results
+
+
+def what_if(user_inputs, pairs=False):
+    """Risk level for every one-slot change to a patient's inputs.
+
+    Returns (base, scenarios): base is the (risk_level, explanation) of the
+    inputs as given, scenarios a list of (changes, risk_level, explanation)
+    where changes maps each altered slot to its new value. pairs=True also
+    covers every two-slot change.
+    """
+    code = encode(user_inputs)
+    user_inputs = unpack_inputs(code)
+    scenarios = what_if_scenarios(user_inputs, pairs)
+
+    table = _decision_table
+    if table is not None:
+        if metrics.enabled:
+            metrics.count("decision_table_hits", len(scenarios) + 1)
+        return table[code], [
+            (changes,) + table[encode({**user_inputs, **changes})] for changes in scenarios
+        ]
+
+    environment, lock = _engine()
+    with lock:
+        return evaluate_what_if(environment, code, scenarios)
+
+
+def what_if_batch(inputs, pairs=False):
+    # what_if() for many patients in input order; there are only TABLE_SIZE
+    # distinct input combinations, so each is analysed once per call
+    analysed = {}
+    results = []
+    for user_inputs in inputs:
+        code = encode(user_inputs)
+        if code not in analysed:
+            analysed[code] = what_if(user_inputs, pairs)
+        results.append(analysed[code])
+    return results
+
+
+# Hot reload
+#
+# reload_rules() builds a fresh environment from rules.clp, validates it by
+# running every input combination, then swaps it in atomically along with a
+# rebuilt decision table. Functions registered with on_reload() are called
+# afterwards so other modules can drop anything derived from the old rules.
+# watch_rules() polls the file and reloads on change; a rule file that fails
+# to build or validate is logged and the previous rules stay in use.
+
+ruleset_generation = 0
+_reload_lock = threading.Lock()
+_reload_listeners = []
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+_rules_state = _file_state(RULES_PATH)
+
+
+def on_reload(callback):
+    _reload_listeners.append(callback)
+    return callback
+
+
+def validate_environment(environment):
+    # Every input combination must get an assessment
+    results = _evaluate_batch(environment, range(TABLE_SIZE))
+    missing = [index for index, (risk_level, _) in enumerate(results) if risk_level == "unknown"]
+    if missing:
+        raise RuleSetError(f"{len(missing)} input combinations get no assessment, "
+                           f"e.g. {unpack_inputs(missing[0])}")
+
+
+def reload_rules(path=RULES_PATH):
+    # Build, validate and swap in the rule set from path. Raises RuleSetError or
+    # clips.CLIPSError on a bad rule file, leaving the current rules in place.
+    global _active, CONSTRUCTS, ruleset_generation, _rules_state
+    global _decision_table, _decision_table_fingerprint
+
+    with _reload_lock:
+        state = _file_state(path)
+        constructs = read_constructs(path)
+        environment = _build_from_source(constructs)
+        validate_environment(environment)
+        table = _build_decision_table(environment) if _decision_table is not None else None
+
+        CONSTRUCTS = constructs
+        _active = (environment, threading.Lock())
+        _decision_table = table
+        _decision_table_fingerprint = ruleset_fingerprint(constructs) if table is not None else None
+        _rules_state = state
+        ruleset_generation += 1
+
+    logging.info("Reloaded rules from %s (generation %d)", path, ruleset_generation)
+    for callback in _reload_listeners:
+        callback()
+
+
+def reload_if_changed():
+    # Reload if rules.clp changed since it was last loaded; returns True on reload
+    global _rules_state
+    state = _file_state(RULES_PATH)
+    if state is None or state == _rules_state:
+        return False
+    try:
+        reload_rules()
+    except (RuleSetError, clips.CLIPSError, OSError) as e:
+        _rules_state = state  # don't retry the same broken file on every poll
+        logging.error("Keeping current rules, %s failed to load: %s", RULES_PATH, e)
+        return False
+    return True
+
+
+class RulesWatcher(threading.Thread):
+    """Background thread polling rules.clp and reloading it when it changes."""
+
+    def __init__(self, interval=1.0):
+        super().__init__(name="rules-watcher", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            reload_if_changed()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def watch_rules(interval=1.0):
+    watcher = RulesWatcher(interval)
+    watcher.start()
+    return watcher
+
+
+# Rule-set registry
+#
+# Clinics that run their own variant of the rules register it by name and
+# version, and infer_risk(inputs, ruleset="clinic-a") scores with it instead
+# of the live rules. Environments are built (and validated) on first use and
+# kept in an LRU capped by count and by the memory CLIPS reports for them, so
+# one process serves every variant in use. The decision table, shadow
+# evaluation and hot reload only concern the live rules.
+
+class RuleSetRegistry:
+    """Named, versioned rule files with an LRU of compiled environments.
+
+    A rule set is looked up as "name" (its most recently registered version)
+    or "name@version". At most max_loaded environments are kept, fewer once
+    their total CLIPS memory exceeds max_bytes; the least recently used one
+    is dropped first. Calls already running on a dropped environment finish
+    on it.
+    """
+
+    def __init__(self, max_loaded=8, max_bytes=None):
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes
+        self._paths = {}
+        self._latest = {}
+        self._loaded = collections.OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, version=None):
+        # Register the rule file at path; version defaults to a hash of its
+        # contents. Returns the "name@version" key. Registering the same
+        # key again replaces it.
+        if "@" in name:
+            raise ValueError(f"Rule set name {name!r} must not contain '@'")
+        if version is None:
+            version = ruleset_fingerprint(read_constructs(path))[:12]
+        key = f"{name}@{version}"
+        with self._lock:
+            self._paths[key] = path
+            self._latest[name] = key
+            self._loaded.pop(key, None)
+            self._stats.setdefault(key, {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0})
+        return key
+
+    def unregister(self, ruleset):
+        with self._lock:
+            key = self._key(ruleset)
+            del self._paths[key]
+            self._loaded.pop(key, None)
+            del self._stats[key]
+            name = key.partition("@")[0]
+            if self._latest.get(name) == key:
+                versions = [other for other in self._paths if other.partition("@")[0] == name]
+                if versions:
+                    self._latest[name] = versions[-1]
+                else:
+                    del self._latest[name]
+
+    def resolve(self, ruleset):
+        # The "name@version" key ruleset currently refers to
+        with self._lock:
+            return self._key(ruleset)
+
+    def _key(self, ruleset):
+        key = ruleset if "@" in ruleset else self._latest.get(ruleset)
+        if key not in self._paths:
+            raise RuleSetError(f"No rule set registered as {ruleset!r}")
+        return key
+
+    def environment(self, ruleset):
+        # The (environment, lock) pair for ruleset, built on first use. Loads
+        # happen under the registry lock, so a rule set is only built once.
+        with self._lock:
+            key = self._key(ruleset)
+            stats = self._stats[key]
+            entry = self._loaded.get(key)
+            if entry is not None:
+                self._loaded.move_to_end(key)
+                stats["hits"] += 1
+                self._evict()
+                return entry[:2]
+
+            start = time.perf_counter()
+            environment = build_environment(self._paths[key])
+            validate_environment(environment)
+            stats["loads"] += 1
+            stats["load_seconds"] += time.perf_counter() - start
+            entry = self._loaded[key] = (environment, threading.Lock(), environment.eval("(mem-used)"))
+            self._evict()
+        logging.info("Loaded rule set %s from %s", key, self._paths[key])
+        return entry[:2]
+
+    def _evict(self):
+        # Drop least recently used environments, always keeping the newest
+        while len(self._loaded) > 1 and (
+                len(self._loaded) > self.max_loaded
+                or self.max_bytes is not None and self.memory() > self.max_bytes):
+            key, _ = self._loaded.popitem(last=False)
+            self._stats[key]["evictions"] += 1
+
+    def memory(self):
+        # Bytes CLIPS reports in use across the loaded environments
+        return sum(size for _, _, size in self._loaded.values())
+
+    def stats(self):
+        # {"name@version": {path, loaded, bytes, loads, hits, evictions, load_seconds}}
+        with self._lock:
+            return {key: {
+                "path": self._paths[key],
+                "loaded": key in self._loaded,
+                "bytes": self._loaded[key][2] if key in self._loaded else 0,
+                **stats,
+            } for key, stats in self._stats.items()}
+
+
+registry = RuleSetRegistry()
+
+
+# Opting in to the decision table builds the environment and table at import
+if os.environ.get("ENGINE_DECISION_TABLE"):
+    enable_decision_table()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    build_image()
+    print(f"Wrote {IMAGE_PATH}")
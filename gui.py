@@ -1,33 +1,148 @@
 import tkinter as tk
+import logging
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
 from datetime import datetime
-from engine import infer_risk
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
+import codec
+from engine import infer_risk, what_if
+from report import ReportCache, save_pdf_report
+from store import AssessmentStore
+from audit import start_audit, stop_audit
 
 # Store the last assessment so to generate a report for it
 last_assessment = {
+    "id": None,
     "inputs": None,
     "risk_level": None,
     "explanation": None,
 }
 
+# Risk levels in increasing order, to tell whether a what-if change helps
+RISK_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+# Every assessment is also kept in the persistent store, opened by main()
+store = None
+
+# Rendered reports, reused when the same assessment is printed again
+report_cache = None
+
+
+class BackgroundWorker:
+    """Runs slow work (engine runs, PDF writes) off the Tk main thread.
+
+    Jobs run one at a time on a worker thread. Their results come back
+    through a queue that the main thread polls with root.after, so Tk
+    widgets are only ever touched from the main thread. Submitting a job
+    whose key is already in flight is ignored, which coalesces repeated
+    clicks.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._done = queue.Queue()
+        self._in_flight = set()
+        self._polling = False
+
+    def busy(self):
+        return bool(self._in_flight)
+
+    def submit(self, key, func, *args, on_done, on_error):
+        if key in self._in_flight:
+            return False
+        self._in_flight.add(key)
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda f: self._done.put((key, f, on_done, on_error)))
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        return True
+
+    def _poll(self):
+        while True:
+            try:
+                key, future, on_done, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._in_flight.discard(key)
+            error = future.exception()
+            if error is None:
+                on_done(future.result())
+            else:
+                on_error(error)
+
+        if self._in_flight:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+        update_buttons()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def update_buttons():
+    # Assess and report stay disabled while any background job is running
+    state = "disabled" if worker.busy() else "normal"
+    assess_button.config(state=state)
+    btn_report.config(state=state)
+
+
 def on_assess():
     # Collect values
-    user_inputs = {
+    user_inputs = codec.normalize({
         "age-group": age_var.get(),
-        "smoking": "yes" if smoking_var.get() == "yes" else "no",
-        "exposure": "yes" if exposure_var.get() == "yes" else "no",
-        "breathing-issue": "yes" if breathing_var.get() == "yes" else "no",
-        "chest-tightness": "yes" if chest_var.get() == "yes" else "no",
-        "family-history": "yes" if family_var.get() == "yes" else "no",
-        "long-term-illness": "yes" if illness_var.get() == "yes" else "no",
-    }
-
-    # Call engine
+        "smoking": smoking_var.get(),
+        "exposure": exposure_var.get(),
+        "breathing-issue": breathing_var.get(),
+        "chest-tightness": chest_var.get(),
+        "family-history": family_var.get(),
+        "long-term-illness": illness_var.get(),
+    })
+
+    # Call engine in the background
+    if worker.submit(
+        "assess", assess_and_store, user_inputs,
+        on_done=lambda result: show_assessment(user_inputs, result),
+        on_error=assess_failed,
+    ):
+        status_var.set("Assessing risk...")
+        update_buttons()
+
+
+def assess_failed(e):
+    status_var.set("Risk assessment failed")
+    messagebox.showerror("Error", f"Risk assessment failed:\n{e}")
+
+
+def assess_and_store(user_inputs):
+    # Runs on the worker thread
     risk_level, explanation = infer_risk(user_inputs)
+    assessment_id = store.insert(user_inputs, risk_level, explanation)
+    _, scenarios = what_if(user_inputs)
+    return assessment_id, risk_level, explanation, scenarios
+
+
+def format_what_if(risk_level, scenarios):
+    # One line per single change, those lowering the risk level first
+    current = RISK_ORDER.get(risk_level, 0)
+    lines = []
+    for changes, level, _ in sorted(scenarios, key=lambda s: RISK_ORDER.get(s[1], 0)):
+        change = ", ".join(f"{slot.replace('-', ' ').capitalize()} -> {value}" for slot, value in changes.items())
+        delta = RISK_ORDER.get(level, 0) - current
+        note = "  (lower)" if delta < 0 else "  (higher)" if delta > 0 else ""
+        lines.append(f"{change}: {level.upper()}{note}")
+    if not any(RISK_ORDER.get(level, 0) < current for _, level, _ in scenarios):
+        lines.insert(0, "No single change lowers the risk level.")
+    return "\n".join(lines)
+
+
+def show_assessment(user_inputs, result):
+    assessment_id, risk_level, explanation, scenarios = result
 
     # Update risk label
     risk_text = risk_level.upper()
@@ -45,95 +160,20 @@ def on_assess():
     explanation_text.insert(tk.END, explanation)
     explanation_text.config(state="disabled")
 
+    # Update what-if box
+    what_if_text.config(state="normal")
+    what_if_text.delete("1.0", tk.END)
+    what_if_text.insert(tk.END, format_what_if(risk_level, scenarios))
+    what_if_text.config(state="disabled")
+
     # Update status bar
     status_var.set(f"Last assessment: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
+    last_assessment["id"] = assessment_id
     last_assessment["inputs"] = user_inputs
     last_assessment["risk_level"] = risk_level
     last_assessment["explanation"] = explanation
 
-# Generate a simple PDF report for one assessment
-def generate_pdf_report(assessment, filepath: str):
- 
-    inputs = assessment["inputs"]
-    risk_level = assessment["risk_level"]
-    explanation = assessment["explanation"]
-
-    c = canvas.Canvas(filepath, pagesize=A4)
-    width, height = A4
-    y = height - 50
-
-    # Title
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, y, "Lung Disease Risk Assessment Report")
-    y -= 30
-
-    # Timestamp
-    c.setFont("Helvetica", 10)
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.drawString(50, y, f"Generated on: {now_str}")
-    y -= 30
-
-    # Risk Level box
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Risk Level:")
-    
-    # Choose color based on risk
-    if risk_level == "high":
-        box_color = colors.red
-    elif risk_level == "medium":
-        box_color = colors.orange
-    else:
-        box_color = colors.green
-
-    c.setFillColor(box_color)
-    c.rect(120, y - 5, 80, 18, fill=1, stroke=0)
-    c.setFillColor(colors.white)
-    c.drawString(130, y - 2, risk_level.upper())
-    c.setFillColor(colors.black)
-    y -= 40
-
-    # Explanation
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Explanation:")
-    y -= 18
-    c.setFont("Helvetica", 10)
-
-    # Simple line wrapping for explanation text
-    max_width = 80  # characters per line (rough)
-    words = explanation.split()
-    line = ""
-    for w in words:
-        if len(line + " " + w) <= max_width:
-            line = (line + " " + w).strip()
-        else:
-            c.drawString(60, y, line)
-            y -= 14
-            line = w
-    if line:
-        c.drawString(60, y, line)
-        y -= 20
-
-    # Patient input summary
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Patient Input Summary:")
-    y -= 18
-    c.setFont("Helvetica", 10)
-
-    for key, value in inputs.items():
-        text = f"- {key.replace('-', ' ').title()}: {value}"
-        c.drawString(60, y, text)
-        y -= 14
-        if y < 50:  # new page if needed
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 10)
-
-    y -= 10
-    c.setFont("Helvetica", 9)
-
-    c.showPage()
-    c.save()
 
 def on_clear():
     age_var.set("middle")
@@ -148,6 +188,9 @@ def on_clear():
     explanation_text.config(state="normal")
     explanation_text.delete("1.0", tk.END)
     explanation_text.config(state="disabled")
+    what_if_text.config(state="normal")
+    what_if_text.delete("1.0", tk.END)
+    what_if_text.config(state="disabled")
     status_var.set("Ready")
 
 def on_generate_report():
@@ -155,186 +198,235 @@ def on_generate_report():
         messagebox.showwarning("No Assessment", "Please perform a risk assessment first before generating a report.")
         return
 
-    # Create reports folder if it doesn't exist
-    os.makedirs("reports", exist_ok=True)
+    if worker.submit(
+        "report", write_report, dict(last_assessment),
+        on_done=report_written,
+        on_error=report_failed,
+    ):
+        status_var.set("Generating PDF report...")
+        update_buttons()
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"risk_report_{timestamp}.pdf"
-    filepath = os.path.join("reports", filename)
 
-    try:
-        generate_pdf_report(last_assessment, filepath)
-        messagebox.showinfo("Report Generated", f"PDF report has been saved to:\n{filepath}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to generate report:\n{e}")
+def write_report(assessment):
+    # Runs on the worker thread: the reports folder may be on a slow network mount
+    filepath = save_pdf_report(assessment, "reports", cache=report_cache)
+    store.set_report_path(assessment["id"], filepath)
+    return filepath
+
+
+def report_written(filepath):
+    status_var.set(f"Report saved: {filepath}")
+    messagebox.showinfo("Report Generated", f"PDF report has been saved to:\n{filepath}")
 
 
-#  MAIN WINDOW 
-root = tk.Tk()
-root.title("Lung Disease Risk Expert System")
+def report_failed(e):
+    status_var.set("Report generation failed")
+    messagebox.showerror("Error", f"Failed to generate report:\n{e}")
 
-root.minsize(650, 450)
 
-style = ttk.Style()
-try:
-    style.theme_use("clam")
-except tk.TclError:
-    pass
-
-content_bg = "#f7f9fb"
-root.configure(bg=content_bg)
-
-root.columnconfigure(0, weight=1)
-root.rowconfigure(0, weight=1)
-
-main_frame = ttk.Frame(root, padding=15)
-main_frame.grid(row=0, column=0, sticky="nsew")
-main_frame.columnconfigure(0, weight=1)
-main_frame.columnconfigure(1, weight=1)
-
-
-
-#  HEADER
-header_label = ttk.Label(
-    main_frame,
-    text="Lung Disease Risk Expert System",
-    font=("Segoe UI", 16, "bold")
-)
-header_label.grid(row=0, column=0, columnspan=2, sticky="w")
-
-subtitle_label = ttk.Label(
-    main_frame,
-    text="Fill in the patient information below and click “Assess Risk”.",
-    font=("Segoe UI", 9)
-)
-subtitle_label.grid(row=1, column=0, columnspan=2, sticky="w", pady=(0, 10))
-
-
-#  PATIENT PROFILE (AGE)
-profile_frame = ttk.LabelFrame(main_frame, text="Patient Profile", padding=10)
-profile_frame.grid(row=2, column=0, sticky="nsew", padx=(0, 10), pady=(0, 10))
-profile_frame.columnconfigure(1, weight=1)
-
-ttk.Label(profile_frame, text="Age group:").grid(row=0, column=0, sticky="w")
-
-age_var = tk.StringVar(value="middle")
-age_frame = ttk.Frame(profile_frame)
-age_frame.grid(row=0, column=1, sticky="w")
-
-ttk.Radiobutton(age_frame, text="Young (0-30)", variable=age_var, value="young").grid(row=0, column=0, padx=(0, 5))
-ttk.Radiobutton(age_frame, text="Middle (31-60)", variable=age_var, value="middle").grid(row=0, column=1, padx=(0, 5))
-ttk.Radiobutton(age_frame, text="Old (61+)", variable=age_var, value="old").grid(row=0, column=2)
-
-#  RISK FACTORS
-factors_frame = ttk.LabelFrame(main_frame, text="Risk Factors", padding=10)
-factors_frame.grid(row=3, column=0, sticky="nsew", padx=(0, 10), pady=(0, 10))
-for i in range(3):
-    factors_frame.columnconfigure(i, weight=1)
-
-
-def add_yes_no(label_text, var, row):
-    ttk.Label(factors_frame, text=label_text).grid(row=row, column=0, sticky="w", pady=2)
-
-    btn_frame = ttk.Frame(factors_frame)
-    btn_frame.grid(row=row, column=1, columnspan=2, sticky="w", pady=2)
-
-    ttk.Radiobutton(btn_frame, text="Yes", variable=var, value="yes").grid(row=0, column=0, padx=(0, 10))
-    ttk.Radiobutton(btn_frame, text="No", variable=var, value="no").grid(row=0, column=1)
-
-
-smoking_var = tk.StringVar(value="no")
-exposure_var = tk.StringVar(value="no")
-breathing_var = tk.StringVar(value="no")
-chest_var = tk.StringVar(value="no")
-family_var = tk.StringVar(value="no")
-illness_var = tk.StringVar(value="no")
-
-add_yes_no("Smoking", smoking_var, 0)
-add_yes_no("Exposure to pollution/chemicals", exposure_var, 1)
-add_yes_no("Breathing issue", breathing_var, 2)
-add_yes_no("Chest tightness", chest_var, 3)
-add_yes_no("Family history of lung disease", family_var, 4)
-add_yes_no("Long-term illness", illness_var, 5)
-
-
-#  RESULT PANEL
-result_frame = ttk.LabelFrame(main_frame, text="Assessment Result", padding=10)
-result_frame.grid(row=2, column=1, rowspan=2, sticky="nsew", pady=(0, 10))
-result_frame.columnconfigure(0, weight=1)
-result_frame.rowconfigure(2, weight=1)
-
-# Risk level label
-risk_header_label = ttk.Label(
-    result_frame,
-    text="Risk Level:",
-    font=("Segoe UI", 11, "bold")
-)
-risk_header_label.grid(row=0, column=0, sticky="w")
-
-risk_value_label = tk.Label(
-    result_frame,
-    text="N/A",
-    font=("Segoe UI", 14, "bold"),
-    bg=content_bg,
-    fg="#333333",
-    padx=10,
-    pady=5
-)
-risk_value_label.grid(row=1, column=0, sticky="w", pady=(2, 8))
-
-# Explanation box with scrollbar
-explanation_frame = ttk.Frame(result_frame)
-explanation_frame.grid(row=2, column=0, sticky="nsew")
-explanation_frame.columnconfigure(0, weight=1)
-explanation_frame.rowconfigure(0, weight=1)
-
-explanation_text = tk.Text(
-    explanation_frame,
-    height=10,
-    wrap="word",
-    font=("Segoe UI", 9),
-    state="disabled"
-)
-explanation_text.grid(row=0, column=0, sticky="nsew")
-
-scrollbar = ttk.Scrollbar(
-    explanation_frame,
-    orient="vertical",
-    command=explanation_text.yview
-)
-scrollbar.grid(row=0, column=1, sticky="ns")
-explanation_text.config(yscrollcommand=scrollbar.set)
-
-#  BUTTONS
-button_frame = ttk.Frame(main_frame)
-button_frame.grid(row=4, column=0, columnspan=2, sticky="e", pady=(5, 0))
-
-assess_button = ttk.Button(button_frame, text="Assess Risk", command=on_assess)
-assess_button.grid(row=0, column=0, padx=(0, 5))
-
-clear_button = ttk.Button(button_frame, text="Clear Form", command=on_clear)
-clear_button.grid(row=0, column=1, padx=(0, 5))
-
-btn_report = ttk.Button(button_frame, text="Generate PDF Report", command=on_generate_report)
-btn_report.grid(row=0, column=2, padx=(5, 0))
-
-#  STATUS BAR
-status_var = tk.StringVar(value="Ready")
-status_bar = ttk.Label(
-    root,
-    textvariable=status_var,
-    anchor="w",
-    padding=(8, 2)
-)
-status_bar.grid(row=1, column=0, sticky="we")
-
-
-# Center window on screen 
-root.update_idletasks()
-w = root.winfo_width()
-h = root.winfo_height()
-x = (root.winfo_screenwidth() // 2) - (w // 2)
-y = (root.winfo_screenheight() // 2) - (h // 2)
-root.geometry(f"+{x}+{y}")
-
-root.mainloop()
+def main():
+    # Build the main window and run the Tk event loop
+    global store, report_cache, worker, root, content_bg, status_var, assess_button, btn_report
+    global age_var, smoking_var, exposure_var, breathing_var, chest_var, family_var, illness_var
+    global risk_value_label, explanation_text, what_if_text
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = AssessmentStore("assessments.db")
+    report_cache = ReportCache(os.path.join("reports", ".cache"))
+    start_audit("audit.jsonl")
+
+    #  MAIN WINDOW 
+    root = tk.Tk()
+    root.title("Lung Disease Risk Expert System")
+
+    root.minsize(650, 450)
+
+    style = ttk.Style()
+    try:
+        style.theme_use("clam")
+    except tk.TclError:
+        pass
+
+    content_bg = "#f7f9fb"
+    root.configure(bg=content_bg)
+
+    root.columnconfigure(0, weight=1)
+    root.rowconfigure(0, weight=1)
+
+    main_frame = ttk.Frame(root, padding=15)
+    main_frame.grid(row=0, column=0, sticky="nsew")
+    main_frame.columnconfigure(0, weight=1)
+    main_frame.columnconfigure(1, weight=1)
+
+
+    #  HEADER
+    header_label = ttk.Label(
+        main_frame,
+        text="Lung Disease Risk Expert System",
+        font=("Segoe UI", 16, "bold")
+    )
+    header_label.grid(row=0, column=0, columnspan=2, sticky="w")
+
+    subtitle_label = ttk.Label(
+        main_frame,
+        text="Fill in the patient information below and click “Assess Risk”.",
+        font=("Segoe UI", 9)
+    )
+    subtitle_label.grid(row=1, column=0, columnspan=2, sticky="w", pady=(0, 10))
+
+
+    #  PATIENT PROFILE (AGE)
+    profile_frame = ttk.LabelFrame(main_frame, text="Patient Profile", padding=10)
+    profile_frame.grid(row=2, column=0, sticky="nsew", padx=(0, 10), pady=(0, 10))
+    profile_frame.columnconfigure(1, weight=1)
+
+    ttk.Label(profile_frame, text="Age group:").grid(row=0, column=0, sticky="w")
+
+    age_var = tk.StringVar(value="middle")
+    age_frame = ttk.Frame(profile_frame)
+    age_frame.grid(row=0, column=1, sticky="w")
+
+    ttk.Radiobutton(age_frame, text="Young (0-30)", variable=age_var, value="young").grid(row=0, column=0, padx=(0, 5))
+    ttk.Radiobutton(age_frame, text="Middle (31-60)", variable=age_var, value="middle").grid(row=0, column=1, padx=(0, 5))
+    ttk.Radiobutton(age_frame, text="Old (61+)", variable=age_var, value="old").grid(row=0, column=2)
+
+    #  RISK FACTORS
+    factors_frame = ttk.LabelFrame(main_frame, text="Risk Factors", padding=10)
+    factors_frame.grid(row=3, column=0, sticky="nsew", padx=(0, 10), pady=(0, 10))
+    for i in range(3):
+        factors_frame.columnconfigure(i, weight=1)
+
+
+    def add_yes_no(label_text, var, row):
+        ttk.Label(factors_frame, text=label_text).grid(row=row, column=0, sticky="w", pady=2)
+
+        btn_frame = ttk.Frame(factors_frame)
+        btn_frame.grid(row=row, column=1, columnspan=2, sticky="w", pady=2)
+
+        ttk.Radiobutton(btn_frame, text="Yes", variable=var, value="yes").grid(row=0, column=0, padx=(0, 10))
+        ttk.Radiobutton(btn_frame, text="No", variable=var, value="no").grid(row=0, column=1)
+
+
+    smoking_var = tk.StringVar(value="no")
+    exposure_var = tk.StringVar(value="no")
+    breathing_var = tk.StringVar(value="no")
+    chest_var = tk.StringVar(value="no")
+    family_var = tk.StringVar(value="no")
+    illness_var = tk.StringVar(value="no")
+
+    add_yes_no("Smoking", smoking_var, 0)
+    add_yes_no("Exposure to pollution/chemicals", exposure_var, 1)
+    add_yes_no("Breathing issue", breathing_var, 2)
+    add_yes_no("Chest tightness", chest_var, 3)
+    add_yes_no("Family history of lung disease", family_var, 4)
+    add_yes_no("Long-term illness", illness_var, 5)
+
+
+    #  RESULT PANEL
+    result_frame = ttk.LabelFrame(main_frame, text="Assessment Result", padding=10)
+    result_frame.grid(row=2, column=1, rowspan=2, sticky="nsew", pady=(0, 10))
+    result_frame.columnconfigure(0, weight=1)
+    result_frame.rowconfigure(2, weight=1)
+    result_frame.rowconfigure(4, weight=1)
+
+    # Risk level label
+    risk_header_label = ttk.Label(
+        result_frame,
+        text="Risk Level:",
+        font=("Segoe UI", 11, "bold")
+    )
+    risk_header_label.grid(row=0, column=0, sticky="w")
+
+    risk_value_label = tk.Label(
+        result_frame,
+        text="N/A",
+        font=("Segoe UI", 14, "bold"),
+        bg=content_bg,
+        fg="#333333",
+        padx=10,
+        pady=5
+    )
+    risk_value_label.grid(row=1, column=0, sticky="w", pady=(2, 8))
+
+    # Explanation box with scrollbar
+    explanation_frame = ttk.Frame(result_frame)
+    explanation_frame.grid(row=2, column=0, sticky="nsew")
+    explanation_frame.columnconfigure(0, weight=1)
+    explanation_frame.rowconfigure(0, weight=1)
+
+    explanation_text = tk.Text(
+        explanation_frame,
+        height=10,
+        wrap="word",
+        font=("Segoe UI", 9),
+        state="disabled"
+    )
+    explanation_text.grid(row=0, column=0, sticky="nsew")
+
+    scrollbar = ttk.Scrollbar(
+        explanation_frame,
+        orient="vertical",
+        command=explanation_text.yview
+    )
+    scrollbar.grid(row=0, column=1, sticky="ns")
+    explanation_text.config(yscrollcommand=scrollbar.set)
+
+    # What-if: the risk level after each single change to the inputs
+    what_if_label = ttk.Label(
+        result_frame,
+        text="What if:",
+        font=("Segoe UI", 11, "bold")
+    )
+    what_if_label.grid(row=3, column=0, sticky="w", pady=(8, 2))
+
+    what_if_text = tk.Text(
+        result_frame,
+        height=8,
+        wrap="word",
+        font=("Segoe UI", 9),
+        state="disabled"
+    )
+    what_if_text.grid(row=4, column=0, sticky="nsew")
+
+    #  BUTTONS
+    button_frame = ttk.Frame(main_frame)
+    button_frame.grid(row=4, column=0, columnspan=2, sticky="e", pady=(5, 0))
+
+    assess_button = ttk.Button(button_frame, text="Assess Risk", command=on_assess)
+    assess_button.grid(row=0, column=0, padx=(0, 5))
+
+    clear_button = ttk.Button(button_frame, text="Clear Form", command=on_clear)
+    clear_button.grid(row=0, column=1, padx=(0, 5))
+
+    btn_report = ttk.Button(button_frame, text="Generate PDF Report", command=on_generate_report)
+    btn_report.grid(row=0, column=2, padx=(5, 0))
+
+    #  STATUS BAR
+    status_var = tk.StringVar(value="Ready")
+    status_bar = ttk.Label(
+        root,
+        textvariable=status_var,
+        anchor="w",
+        padding=(8, 2)
+    )
+    status_bar.grid(row=1, column=0, sticky="we")
+
+
+    # Center window on screen 
+    root.update_idletasks()
+    w = root.winfo_width()
+    h = root.winfo_height()
+    x = (root.winfo_screenwidth() // 2) - (w // 2)
+    y = (root.winfo_screenheight() // 2) - (h // 2)
+    root.geometry(f"+{x}+{y}")
+
+    worker = BackgroundWorker(root)
+
+    root.mainloop()
+    worker.shutdown()
+    store.close()
+    stop_audit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# metrics.py
+#
+# Lightweight instrumentation for the inference engine: per-rule fire
+# counters, latency histograms for each phase of an assessment and a few event
+# counters. Disabled by default; the engine checks `enabled` before taking any
+# timings, so the switch costs one attribute lookup per call.
+
+import bisect
+import threading
+
+# Upper bounds in seconds, Prometheus style; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class EngineMetrics:
+    """Collects rule firings, phase latencies and event counts."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.enabled = False
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._rules = {}
+            self._events = {}
+            self._phases = {}
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            self._observe(phase, seconds)
+
+    def _observe(self, phase, seconds):
+        histogram = self._phases.get(phase)
+        if histogram is None:
+            histogram = self._phases[phase] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        histogram["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+    def count(self, event, amount=1):
+        with self._lock:
+            self._events[event] = self._events.get(event, 0) + amount
+
+    def record(self, timings, rules=()):
+        # One assessment (or batch): phase timings plus the rule(s) that fired
+        with self._lock:
+            for phase, seconds in timings.items():
+                self._observe(phase, seconds)
+            for rule in rules:
+                self._rules[rule] = self._rules.get(rule, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            phases = {}
+            for phase, histogram in self._phases.items():
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + (float("inf"),), histogram["counts"]):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                phases[phase] = {"count": histogram["count"], "sum": histogram["sum"], "buckets": buckets}
+            return {
+                "enabled": self.enabled,
+                "rules": dict(self._rules),
+                "events": dict(self._events),
+                "phases": phases,
+            }
+
+    def to_prometheus(self, prefix="engine"):
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_rule_fired_total Assessments decided by each rule.",
+            f"# TYPE {prefix}_rule_fired_total counter",
+        ]
+        for rule, count in sorted(snapshot["rules"].items()):
+            lines.append(f'{prefix}_rule_fired_total{{rule="{rule}"}} {count}')
+
+        lines += [
+            f"# HELP {prefix}_events_total Engine events such as decision-table hits.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for event, count in sorted(snapshot["events"].items()):
+            lines.append(f'{prefix}_events_total{{event="{event}"}} {count}')
+
+        lines += [
+            f"# HELP {prefix}_phase_seconds Time spent in each phase of an assessment.",
+            f"# TYPE {prefix}_phase_seconds histogram",
+        ]
+        for phase, histogram in sorted(snapshot["phases"].items()):
+            for bound, count in histogram["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_phase_seconds_bucket{{phase="{phase}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {histogram["sum"]}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{phase}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,250 @@
+# optimize_rules.py
+#
+# Offline rule-set analysis. Runs every input combination through the rule set,
+# reports which rules never fire and which higher-priority rules shadow them,
+# then emits an equivalent, leaner rule file:
+#
+#   - rules that never fire are dropped (a catch-all rule matching every
+#     patient is kept, so out-of-domain values still get an assessment)
+#   - each remaining rule's patient pattern and test CEs are replaced by plain
+#     slot constraints covering the inputs the rule is responsible for, so the
+#     Rete network no longer evaluates (test ...) expressions
+#
+# The emitted rule set is checked against the original over the whole input
+# space and only written if every combination fires the same rule with the same
+# result.
+#
+#   python optimize_rules.py                       # analyse engine.CONSTRUCTS
+#   python optimize_rules.py --rules rules.clp -o rules.optimized.clp
+
+import argparse
+import itertools
+import logging
+import os
+import re
+import sys
+from collections import Counter
+
+import clips
+
+import codec
+import engine
+
+SALIENCE = re.compile(r"\(declare\s+\(salience\s+(-?\d+)\)\)")
+RHS = re.compile(r"\s=>\s")
+
+
+def load_ruleset(path=None):
+    # Fresh environment with a .clp file loaded, or engine.CONSTRUCTS built
+    environment = clips.Environment()
+    environment.add_router(clips.LoggingRouter())
+    if path:
+        environment.load(path)
+    else:
+        for construct in engine.CONSTRUCTS:
+            environment.build(construct)
+    return environment
+
+
+def _agenda(environment, user_inputs):
+    # Rule names on the agenda after asserting one patient, in firing order
+    environment.reset()
+    slots = {slot: clips.Symbol(value) for slot, value in user_inputs.items()}
+    environment.find_template("patient").assert_fact(**slots)
+    return [activation.name for activation in environment.activations()]
+
+
+def analyse(environment):
+    """Enumerate the input space against a rule set.
+
+    Returns (rules, matched, fired): rules is a list of (name, salience, pretty
+    print) in definition order, matched maps each rule name to the bitmask of
+    input codes whose patient it matches, and fired lists the rule that fires
+    first for every input code.
+    """
+    rules = []
+    for rule in environment.rules():
+        text = str(rule)
+        salience = SALIENCE.search(text)
+        rules.append((rule.name, int(salience.group(1)) if salience else 0, text))
+
+    matched = {name: 0 for name, _, _ in rules}
+    fired = []
+    for code in range(codec.TABLE_SIZE):
+        agenda = _agenda(environment, codec.unpack_inputs(code))
+        for name in set(agenda):
+            matched[name] |= 1 << code
+        fired.append(agenda[0] if agenda else None)
+    return rules, matched, fired
+
+
+def shadow_report(rules, matched, fired):
+    # Lines describing rules that never fire and what fires in their place
+    lines = []
+    fire_counts = Counter(fired)
+    for name, _, _ in rules:
+        if fire_counts[name]:
+            continue
+        codes = [code for code in range(codec.TABLE_SIZE) if matched[name] >> code & 1]
+        if not codes:
+            lines.append(f"{name}: never fires (matches no input)")
+            continue
+        shadows = Counter(fired[code] for code in codes)
+        detail = ", ".join(f"{other} ({count})" for other, count in shadows.most_common())
+        lines.append(f"{name}: never fires; its {len(codes)} matching inputs are taken by {detail}")
+    return lines
+
+
+# Cubes: a set of allowed age groups plus, per yes/no slot, yes, no or either.
+# Every cube is precomputed with the bitmask of input codes it covers.
+
+def _all_cubes():
+    ages = range(len(codec.AGE_GROUPS))
+    age_sets = [subset for size in (3, 2, 1) for subset in itertools.combinations(ages, size)]
+    cubes = []
+    for age_set in age_sets:
+        for flags in itertools.product((None, 1, 0), repeat=len(codec.FLAG_SLOTS)):
+            mask = 0
+            for code in range(codec.TABLE_SIZE):
+                if code >> len(codec.FLAG_SLOTS) not in age_set:
+                    continue
+                if all(want is None or (code >> (len(flags) - 1 - position) & 1) == want
+                       for position, want in enumerate(flags)):
+                    mask |= 1 << code
+            literals = (len(age_set) < 3) + sum(want is not None for want in flags)
+            cubes.append((mask, literals, age_set, flags))
+    return cubes
+
+
+def _cover(required, allowed, cubes):
+    # Greedy cover of the required codes with cubes that stay inside allowed
+    candidates = [cube for cube in cubes if cube[0] & ~allowed == 0 and cube[0] & required]
+    chosen = []
+    remaining = required
+    while remaining:
+        best = max(candidates, key=lambda cube: (bin(cube[0] & remaining).count("1"), -cube[1]))
+        chosen.append(best)
+        remaining &= ~best[0]
+    return chosen
+
+
+def _pattern(cube):
+    _, _, age_set, flags = cube
+    slots = ["(id ?id)"]
+    if len(age_set) < len(codec.AGE_GROUPS):
+        slots.append("(age-group " + "|".join(codec.AGE_GROUPS[age] for age in age_set) + ")")
+    for slot, want in zip(codec.FLAG_SLOTS, flags):
+        if want is not None:
+            slots.append(f"({slot} {'yes' if want else 'no'})")
+    return "(patient " + " ".join(slots) + ")"
+
+
+def optimize(rules, matched, fired):
+    # Equivalent defrule constructs for the rules worth keeping
+    everything = (1 << codec.TABLE_SIZE) - 1
+    priority = {name: (-salience, position) for position, (name, salience, _) in enumerate(rules)}
+    cubes = _all_cubes()
+    constructs = []
+
+    for name, salience, text in rules:
+        required = sum(1 << code for code, rule in enumerate(fired) if rule == name)
+        catch_all = matched[name] == everything
+        if not required and not catch_all:
+            continue
+
+        if catch_all:
+            patterns = ["(patient (id ?id))"]
+        else:
+            # Inputs taken by a higher-priority rule are don't-cares: matching
+            # them here cannot change the outcome
+            allowed = required | sum(1 << code for code, rule in enumerate(fired)
+                                     if rule is not None and priority[rule] < priority[name])
+            patterns = [_pattern(cube) for cube in _cover(required, allowed, cubes)]
+
+        if len(patterns) == 1:
+            lhs = patterns[0]
+        else:
+            lhs = "(or " + "\n      ".join(patterns) + ")"
+        rhs = RHS.split(text, 1)[1].strip()[:-1]
+
+        constructs.append(
+            f"(defrule {name}\n"
+            f"  (declare (salience {salience}))\n"
+            f"  {lhs}\n"
+            f"  (not (risk-assessment (id ?id)))\n"
+            f"=>\n"
+            f"  {rhs})\n"
+        )
+    return constructs
+
+
+def build_optimized(constructs):
+    optimized = clips.Environment()
+    optimized.add_router(clips.LoggingRouter())
+    for construct in constructs:
+        optimized.build(construct)
+    return optimized
+
+
+def write_rules(path, constructs, source):
+    # Write constructs as a rules file engine.read_constructs() can load, with
+    # the unqualified names the rest of the code expects
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"; {os.path.basename(path)}\n")
+        f.write(f"; Generated by optimize_rules.py from {os.path.basename(source)}; equivalent\n")
+        f.write(f"; to it on all {codec.TABLE_SIZE} input combinations.\n\n")
+        f.write("\n\n".join(construct.strip() for construct in constructs) + "\n")
+
+
+def differences(original, optimized):
+    # Input codes where the fired rule or the (risk-level, explanation) differ
+    diffs = []
+    for code in range(codec.TABLE_SIZE):
+        user_inputs = codec.unpack_inputs(code)
+        before = (_agenda(original, user_inputs)[:1], engine.evaluate(original, user_inputs))
+        after = (_agenda(optimized, user_inputs)[:1], engine.evaluate(optimized, user_inputs))
+        if before != after:
+            diffs.append((code, before, after))
+    return diffs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse the rule set and emit an equivalent, leaner rules file.")
+    parser.add_argument("--rules", help="rule file to analyse (default: rules.clp)")
+    parser.add_argument("-o", "--output", default="rules.optimized.clp", help="where to write the optimized rules")
+    parser.add_argument("--report-only", action="store_true", help="analyse without writing a rules file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    environment = load_ruleset(args.rules)
+    rules, matched, fired = analyse(environment)
+
+    print(f"{len(rules)} rules, {codec.TABLE_SIZE} input combinations")
+    for name, count in sorted(Counter(fired).items(), key=lambda item: -item[1]):
+        print(f"  {name}: fires on {count}")
+    for line in shadow_report(rules, matched, fired) or ["every rule fires on some input"]:
+        print(line)
+
+    if args.report_only:
+        return 0
+
+    source = engine.read_constructs(args.rules) if args.rules else engine.CONSTRUCTS
+    templates = [construct for construct in source if construct.lstrip().startswith("(deftemplate")]
+    constructs = optimize(rules, matched, fired)
+    optimized = build_optimized(templates + constructs)
+    diffs = differences(environment, optimized)
+    if diffs:
+        for code, before, after in diffs:
+            print(f"MISMATCH {codec.unpack_inputs(code)}: {before} -> {after}", file=sys.stderr)
+        print("Optimized rule set is not equivalent; nothing written", file=sys.stderr)
+        return 1
+
+    write_rules(args.output, templates + constructs, args.rules or engine.RULES_PATH)
+    print(f"{len(constructs)}/{len(rules)} rules kept; equivalent on all "
+          f"{codec.TABLE_SIZE} combinations; written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# pool.py
+import itertools
+import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import engine
+
+
+class EnginePool:
+    """A fixed set of pre-built CLIPS environments shared between threads.
+
+    Each call checks an environment out, runs on it exclusively and checks it
+    back in, so concurrent callers never touch the same environment. An
+    environment built before the last engine.reload_rules() is replaced with
+    a fresh one when it is next checked out.
+    """
+
+    def __init__(self, size=None, timeout=None):
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        # LIFO so the most recently used (warmest) environment is reused first
+        self._idle = queue.LifoQueue()
+        self._generations = {}
+        for _ in range(self.size):
+            self._idle.put(self._new_environment())
+
+    def _new_environment(self):
+        generation = engine.ruleset_generation
+        env = engine.create_environment()
+        self._generations[id(env)] = generation
+        return env
+
+    def checkout(self, timeout=None):
+        # Wait up to timeout seconds (the pool default if None) for a free environment
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            env = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No engine environment free after {timeout} seconds") from None
+        if self._generations[id(env)] != engine.ruleset_generation:
+            del self._generations[id(env)]
+            env = self._new_environment()
+        return env
+
+    def checkin(self, env):
+        self._idle.put(env)
+
+    @contextmanager
+    def environment(self, timeout=None):
+        env = self.checkout(timeout)
+        try:
+            yield env
+        finally:
+            self.checkin(env)
+
+    def infer_risk(self, user_inputs, timeout=None):
+        with self.environment(timeout) as env:
+            return engine.evaluate(env, user_inputs)
+
+    def infer_risk_batch(self, inputs, timeout=None):
+        inputs = list(inputs)
+        with self.environment(timeout) as env:
+            return engine.evaluate_batch(env, inputs)
+
+
+# Process pool: each worker process imports engine once, which builds its
+# own global environment, and then scores whole chunks with infer_risk_batch.
+# Workers pick up rule changes by checking rules.clp before each chunk.
+
+def _score_chunk(chunk):
+    engine.reload_if_changed()
+    return engine.infer_risk_batch(chunk)
+
+
+class ProcessEnginePool:
+    """Score across CPU cores with one rule-set environment per worker process."""
+
+    def __init__(self, workers=None, chunk_size=1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def imap(self, inputs):
+        # Yield results in input order, keeping at most two chunks per worker
+        # in flight so memory stays bounded for arbitrarily long inputs
+        inputs = iter(inputs)
+        pending = deque()
+        while True:
+            while len(pending) < self.workers * 2:
+                chunk = list(itertools.islice(inputs, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(self._executor.submit(_score_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+    def infer_risk_batch(self, inputs):
+        return list(self.imap(inputs))
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
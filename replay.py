@@ -0,0 +1,227 @@
+# replay.py
+#
+# Replays recorded traffic against a rule set. Reads the engine's INFO logs
+# ("Asserting fact: (patient ...)" followed by "Inference result: ...") or
+# the JSONL audit trail, re-scores every patient in bulk and reports each
+# one whose result differs from the recorded one, along with throughput.
+#
+#   python replay.py engine.log                        # against rules.clp
+#   python replay.py engine.log.1 engine.log --rules rules.candidate.clp --diff diff.jsonl
+#   python replay.py audit.jsonl --engine --chunk-size 2000
+#
+# Patient facts are picked apart with a regex rather than parsed by CLIPS.
+# By default the rule set is run once over the 192 input combinations and
+# every patient is looked up in that table, so replay runs far faster than
+# the original traffic; --engine scores every patient through CLIPS in
+# batches instead, which makes it a load test of the engine itself.
+
+import argparse
+import gzip
+import itertools
+import json
+import logging
+import re
+import sys
+import time
+from collections import Counter
+
+import codec
+import engine
+
+FACT_MARKER = "Asserting fact:"
+RESULT_MARKER = "Inference result:"
+
+_SLOT = re.compile(r"\(([\w-]+)\s+([^()\s]+)\)")
+
+
+def _open(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def parse_log(lines):
+    # Yield (line number, user_inputs, logged result or None) for each
+    # asserted patient. The fact may span several lines; the result is the
+    # next "Inference result" line before another fact is asserted.
+    pending = None
+    fact = None
+    depth = 0
+    for line_number, line in enumerate(lines, 1):
+        if fact is not None:
+            fact.append(line)
+            depth += line.count("(") - line.count(")")
+            if depth > 0:
+                continue
+            pending = (pending[0], dict(_SLOT.findall("".join(fact))))
+            fact = None
+            continue
+
+        position = line.find(FACT_MARKER)
+        if position >= 0:
+            if pending is not None:
+                yield pending[0], pending[1], None
+            text = line[position + len(FACT_MARKER):]
+            pending = (line_number, None)
+            depth = text.count("(") - text.count(")")
+            if depth > 0:
+                fact = [text]
+            else:
+                pending = (line_number, dict(_SLOT.findall(text)))
+            continue
+
+        position = line.find(RESULT_MARKER)
+        if position >= 0 and pending is not None:
+            risk_level, _, explanation = line[position + len(RESULT_MARKER):].strip().partition(" - ")
+            yield pending[0], pending[1], (risk_level, explanation)
+            pending = None
+
+    if pending is not None and pending[1] is not None:
+        yield pending[0], pending[1], None
+
+
+def parse_audit(lines):
+    # Same triples from audit.jsonl records
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield line_number, record["inputs"], (record["risk-level"], record["explanation"])
+        except (ValueError, KeyError, TypeError):
+            logging.warning("Line %d: not an audit record, skipped", line_number)
+
+
+def _detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "audit" if name.endswith((".jsonl", ".json")) else "log"
+
+
+class Replay:
+    """Re-scores recorded assessments and tallies the differences.
+
+    Patients are keyed by input code. With a decision table (the default)
+    each one is a table lookup; with use_engine they are scored with
+    evaluate_batch in chunks. Patients outside the 192 combinations are
+    counted as invalid and not replayed.
+    """
+
+    def __init__(self, rules_path=engine.RULES_PATH, use_engine=False, chunk_size=1000, samples=20):
+        self.environment = engine.build_environment(rules_path)
+        self.table = None if use_engine else engine.evaluate_batch(self.environment, range(codec.TABLE_SIZE))
+        self.chunk_size = chunk_size
+        self.samples = samples
+        self.replayed = 0
+        self.invalid = 0
+        self.unlogged = 0
+        self.changes = Counter()
+        self.examples = []
+
+    def score(self, codes):
+        table = self.table
+        if table is None:
+            return engine.evaluate_batch(self.environment, codes)
+        return [table[code] for code in codes]
+
+    def run(self, records, diff=None):
+        # records are (source, line number, user_inputs, logged result) tuples
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, self.chunk_size))
+            if not chunk:
+                return
+            codes = [codec.pack_inputs(user_inputs) for _, _, user_inputs, _ in chunk]
+            if None in codes:
+                self.invalid += codes.count(None)
+                chunk = [record for record, code in zip(chunk, codes) if code is not None]
+                codes = [code for code in codes if code is not None]
+            results = self.score(codes)
+            self.replayed += len(chunk)
+            for (source, line_number, user_inputs, logged), (risk_level, explanation) in zip(chunk, results):
+                if logged is None:
+                    self.unlogged += 1
+                    continue
+                replayed = (str(risk_level), str(explanation))
+                if replayed == logged:
+                    continue
+                self.changes[(logged[0], replayed[0])] += 1
+                entry = {
+                    "source": source,
+                    "line": line_number,
+                    "inputs": user_inputs,
+                    "logged": list(logged),
+                    "replayed": list(replayed),
+                }
+                if len(self.examples) < self.samples:
+                    self.examples.append(entry)
+                if diff is not None:
+                    diff.write(json.dumps(entry) + "\n")
+
+    @property
+    def differences(self):
+        return sum(self.changes.values())
+
+
+def read_traffic(paths, fmt=None):
+    # (source, line number, user_inputs, logged result) across all files in order
+    for path in paths:
+        stream = _open(path)
+        try:
+            parse = parse_audit if (fmt or _detect_format(path)) == "audit" else parse_log
+            for line_number, user_inputs, logged in parse(stream):
+                yield path, line_number, user_inputs, logged
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score recorded engine traffic and report changed results.")
+    parser.add_argument("logs", nargs="*", default=["-"], help="engine logs or audit JSONL files, .gz allowed "
+                                                                "(default: stdin)")
+    parser.add_argument("--format", choices=("log", "audit"),
+                        help="input format (default: audit for .jsonl, else engine log)")
+    parser.add_argument("--rules", default=engine.RULES_PATH, help="rule file to replay against (default: rules.clp)")
+    parser.add_argument("--engine", action="store_true",
+                        help="score every patient through CLIPS instead of a decision table")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="patients per engine run (default: 1000)")
+    parser.add_argument("--diff", help="write every changed result here as JSONL")
+    parser.add_argument("--samples", type=int, default=20, help="changed results to print (default: 20)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    start = time.perf_counter()
+    replay = Replay(args.rules, use_engine=args.engine, chunk_size=args.chunk_size, samples=args.samples)
+    setup = time.perf_counter() - start
+
+    diff = open(args.diff, "w", encoding="utf-8") if args.diff else None
+    try:
+        start = time.perf_counter()
+        replay.run(read_traffic(args.logs, args.format), diff)
+        seconds = time.perf_counter() - start
+    finally:
+        if diff is not None:
+            diff.close()
+
+    rate = replay.replayed / seconds if seconds else 0.0
+    mode = "engine" if args.engine else "decision table"
+    print(f"Replayed {replay.replayed} assessments against {args.rules} in {seconds:.2f}s "
+          f"({rate:,.0f}/s, {mode}, {setup:.2f}s setup)")
+    if replay.invalid:
+        print(f"{replay.invalid} patients outside the engine's input domain were skipped")
+    if replay.unlogged:
+        print(f"{replay.unlogged} had no logged result to compare")
+    print(f"{replay.differences} results differ from the log")
+    for (was, now), count in replay.changes.most_common():
+        print(f"  {was} -> {now}: {count}")
+    for entry in replay.examples:
+        print(f"  {entry['source']}:{entry['line']} {entry['inputs']}: "
+              f"{entry['logged'][0]} -> {entry['replayed'][0]} ({entry['replayed'][1]})")
+    return 1 if replay.differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
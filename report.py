@@ -0,0 +1,523 @@
+# report.py
+#
+# reportlab and the process pool are imported inside the functions that use
+# them, so importing this module costs nothing until a PDF is written.
+import functools
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import islice
+
+import codec
+
+# Name of the reusable form holding the static page layout in bulk documents
+STATIC_FORM = "report-static"
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# Generate a simple PDF report for one assessment
+def generate_pdf_report(assessment, filepath: str):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(filepath, pagesize=A4)
+    _draw_report(c, assessment)
+    c.save()
+
+
+def _draw_static(c):
+    # Title and section headings: identical on every report page
+    from reportlab.lib.pagesizes import A4
+
+    width, height = A4
+    y = height - 50
+
+    # Title
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, y, "Lung Disease Risk Assessment Report")
+
+    # Risk Level label and Explanation heading
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y - 60, "Risk Level:")
+    c.drawString(50, y - 100, "Explanation:")
+
+
+@functools.lru_cache(maxsize=256)
+def _wrap_lines(text, max_width=80):
+    # Simple line wrapping for explanation text: max_width is characters per
+    # line (rough). The last entry may be empty. Explanations come from a small
+    # fixed set, so results are cached.
+    lines = []
+    line = ""
+    for w in text.split():
+        if len(line) + 1 + len(w) <= max_width:
+            line = f"{line} {w}" if line else w
+        else:
+            lines.append(line)
+            line = w
+    lines.append(line)
+    return tuple(lines)
+
+
+def _draw_report(c, assessment, form=None, generated=None):
+    # One report page; the static layout comes from form when given and the
+    # "Generated on" time from generated (default: now)
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+
+    # Canonical slot order and spelling, whatever the caller passed in
+    inputs = codec.normalize(assessment["inputs"])
+    risk_level = assessment["risk_level"]
+    explanation = assessment["explanation"]
+
+    width, height = A4
+    if form:
+        c.doForm(form)
+    else:
+        _draw_static(c)
+    y = height - 80
+
+    # Timestamp
+    c.setFont("Helvetica", 10)
+    now_str = generated or datetime.now().strftime(TIMESTAMP_FORMAT)
+    c.drawString(50, y, f"Generated on: {now_str}")
+    y -= 30
+
+    # Risk Level box
+    c.setFont("Helvetica-Bold", 12)
+
+    # Choose color based on risk
+    if risk_level == "high":
+        box_color = colors.red
+    elif risk_level == "medium":
+        box_color = colors.orange
+    else:
+        box_color = colors.green
+
+    c.setFillColor(box_color)
+    c.rect(120, y - 5, 80, 18, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.drawString(130, y - 2, risk_level.upper())
+    c.setFillColor(colors.black)
+    y -= 40
+
+    # Explanation
+    y -= 18
+    c.setFont("Helvetica", 10)
+
+    *lines, last = _wrap_lines(explanation)
+    for line in lines:
+        c.drawString(60, y, line)
+        y -= 14
+    if last:
+        c.drawString(60, y, last)
+        y -= 20
+
+    # Patient input summary
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "Patient Input Summary:")
+    y -= 18
+    c.setFont("Helvetica", 10)
+
+    for key, value in inputs.items():
+        text = f"- {key.replace('-', ' ').title()}: {value}"
+        c.drawString(60, y, text)
+        y -= 14
+        if y < 50:  # new page if needed
+            c.showPage()
+            y = height - 50
+            c.setFont("Helvetica", 10)
+
+    c.showPage()
+
+
+def _render_file(filepath, assessments):
+    # One PDF with a page per assessment; the static layout is drawn once as a form
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(filepath, pagesize=A4)
+    c.beginForm(STATIC_FORM)
+    _draw_static(c)
+    c.endForm()
+    for assessment in assessments:
+        _draw_report(c, assessment, form=STATIC_FORM)
+    c.save()
+    return filepath
+
+
+def _render_files(jobs):
+    # Worker task: several (filepath, assessments) files, to amortise task overhead
+    return [_render_file(filepath, assessments) for filepath, assessments in jobs]
+
+
+# Reports handed to a worker per task in bulk runs
+TASK_SIZE = 64
+
+
+def generate_bulk_reports(assessments, directory, per_file=1, workers=None,
+                          filename="risk_report_{index:06d}.pdf"):
+    """Render many assessments to PDF across worker processes.
+
+    per_file=1 writes one report per file, per_file=N writes multi-page
+    files of up to N reports, and per_file=None writes everything into a
+    single file in this process. filename is formatted with the index of
+    the first assessment in each file. Assessments are read lazily and at
+    most two tasks of about TASK_SIZE reports per worker are pending at
+    once, so memory stays bounded for any number of assessments. Returns
+    the written paths in order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(directory, exist_ok=True)
+    assessments = iter(assessments)
+
+    if per_file is None:
+        return [_render_file(os.path.join(directory, filename.format(index=0)), assessments)]
+
+    workers = workers or os.cpu_count() or 1
+    files_per_task = max(1, TASK_SIZE // per_file)
+    paths = []
+    pending = deque()
+    index = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(pending) < workers * 2:
+                jobs = []
+                while len(jobs) < files_per_task:
+                    chunk = list(islice(assessments, per_file))
+                    if not chunk:
+                        break
+                    jobs.append((os.path.join(directory, filename.format(index=index)), chunk))
+                    index += len(chunk)
+                if not jobs:
+                    break
+                pending.append(executor.submit(_render_files, jobs))
+            if not pending:
+                break
+            paths.extend(pending.popleft().result())
+    return paths
+
+
+# Report cache
+#
+# A report only depends on the inputs, the result and the page layout, apart
+# from its "Generated on" time. ReportCache keeps rendered bodies on disk under
+# a hash of those, with the time left as a fixed-width placeholder in an
+# uncompressed page stream; each copy is the cached body with the current
+# time written over the placeholder (and the PDF creation dates), byte for
+# byte the same length so the cross-reference offsets stay valid. Reprinting
+# a report for a follow-up visit is then a file read instead of a render.
+
+# Bump whenever _draw_static/_draw_report change what a report looks like
+TEMPLATE_VERSION = 2
+
+_PLACEHOLDER = "YYYY-MM-DD HH:MM:SS"
+_PDF_DATES = re.compile(rb"(/(?:CreationDate|ModDate) \(D:)\d{14}")
+
+
+def report_key(assessment):
+    # Content hash of everything a report shows except its timestamp; the
+    # inputs go in as their code, so any spelling of a patient hits one entry
+    content = [TEMPLATE_VERSION, codec.encode(assessment["inputs"]),
+               str(assessment["risk_level"]), str(assessment["explanation"])]
+    return hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+
+
+def render_report_body(assessment):
+    # Report bytes with the timestamp placeholder, ready for stamp_report
+    import io
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=0)
+    _draw_report(c, assessment, generated=_PLACEHOLDER)
+    c.save()
+    return buffer.getvalue()
+
+
+def stamp_report(body, when=None):
+    # A copy of a cached body generated at when (default: now)
+    when = when or datetime.now()
+    body = body.replace(_PLACEHOLDER.encode("ascii"), when.strftime(TIMESTAMP_FORMAT).encode("ascii"), 1)
+    return _PDF_DATES.sub(lambda match: match.group(1) + when.strftime("%Y%m%d%H%M%S").encode("ascii"), body)
+
+
+def _write_atomic(path, data):
+    # Write to a temporary file in the same directory, then rename over path
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_new(directory, name, data):
+    # Write data under a name that no other file has, never overwriting one:
+    # name, then name-2, name-3, ... The file appears complete or not at all
+    # where the filesystem has hard links; elsewhere it is briefly empty.
+    stem, ext = os.path.splitext(name)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        attempt = 1
+        while True:
+            path = os.path.join(directory, name if attempt == 1 else f"{stem}-{attempt}{ext}")
+            try:
+                os.link(tmp_path, path)
+                os.unlink(tmp_path)
+                return path
+            except FileExistsError:
+                attempt += 1
+                continue
+            except OSError:
+                pass
+            # No hard links here (SMB shares, FAT, exFAT): reserve the name,
+            # then rename the finished file over the empty placeholder
+            try:
+                os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+            except FileExistsError:
+                attempt += 1
+                continue
+            try:
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(path)
+                raise
+            return path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ReportCache:
+    """Rendered report bodies on disk, least recently used evicted first.
+
+    Bodies live in directory as <key>.pdf, where key is report_key(); the
+    total stays under max_bytes. A hit touches the file, so the LRU order
+    survives restarts and is shared by processes using the same directory.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pdf")
+
+    def body(self, assessment):
+        # The cached body for assessment, rendering and storing it on a miss
+        key = report_key(assessment)
+        path = self._path(key)
+        with self._lock:
+            known = key in self._entries
+        if known:
+            try:
+                with open(path, "rb") as cached:
+                    body = cached.read()
+                os.utime(path)
+            except OSError:
+                body = None
+            with self._lock:
+                if body is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                self._entries.pop(key, None)
+
+        body = render_report_body(assessment)
+        _write_atomic(path, body)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = len(body)
+            self._entries.move_to_end(key)
+            self._evict()
+        return body
+
+    def _evict(self):
+        size = sum(self._entries.values())
+        while size > self.max_bytes and len(self._entries) > 1:
+            key, evicted = self._entries.popitem(last=False)
+            size -= evicted
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def size(self):
+        with self._lock:
+            return sum(self._entries.values())
+
+
+def save_pdf_report(assessment, directory, cache=None, when=None):
+    """Write a report for assessment into directory and return its path.
+
+    The file is named risk_report_<timestamp>.pdf, with a -2, -3, ... suffix
+    if that name is taken, and appears atomically. With a ReportCache the
+    body is rendered at most once per distinct assessment.
+    """
+    when = when or datetime.now()
+    if cache is not None:
+        body = cache.body(assessment)
+    else:
+        body = render_report_body(assessment)
+    os.makedirs(directory, exist_ok=True)
+    return _write_new(directory, f"risk_report_{when:%Y%m%d_%H%M%S}.pdf", stamp_report(body, when))
+
+
+# Cohort summary report
+
+LEVEL_COLORS = {"high": "red", "medium": "orange", "low": "green"}
+
+
+def _percent(part, whole):
+    return f"{100.0 * part / whole:.1f}%" if whole else "-"
+
+
+def _bar_chart(categories, series, names, horizontal=False, width=450, height=180, value_format="%d"):
+    # A grouped bar chart: one bar per series within each category
+    from reportlab.graphics.charts.barcharts import HorizontalBarChart, VerticalBarChart
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+
+    drawing = Drawing(width, height + 30)
+    chart = HorizontalBarChart() if horizontal else VerticalBarChart()
+    chart.x = 140 if horizontal else 40
+    chart.y = 20
+    chart.width = width - chart.x - 10
+    chart.height = height - 20
+    chart.data = [tuple(values) for values in series]
+    chart.categoryAxis.categoryNames = list(categories)
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.labelTextFormat = value_format
+    chart.barLabelFormat = value_format
+    chart.barLabels.fontSize = 6
+    chart.barLabels.nudge = 6
+    for index, name in enumerate(names):
+        chart.bars[index].fillColor = getattr(colors, LEVEL_COLORS.get(name, "steelblue"))
+        chart.bars[index].strokeWidth = 0
+    drawing.add(chart)
+
+    if len(names) > 1:
+        legend = Legend()
+        legend.x = chart.x
+        legend.y = height + 20
+        legend.alignment = "right"
+        legend.columnMaximum = 1
+        legend.fontSize = 8
+        legend.colorNamePairs = [(chart.bars[index].fillColor, name) for index, name in enumerate(names)]
+        drawing.add(legend)
+    return drawing
+
+
+def _table(rows, col_widths=None):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    table = Table(rows, colWidths=col_widths, repeatRows=1, hAlign="LEFT")
+    table.setStyle(TableStyle([
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 9),
+        ("FONT", (0, 1), (-1, -1), "Helvetica", 9),
+        ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.black),
+        ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+    ]))
+    return table
+
+
+def generate_cohort_report(summary, filepath, title="Cohort Risk Summary", source=None):
+    """Write a summary PDF for a cohort.CohortSummary.
+
+    Risk-level distribution by age group, risk-factor prevalence and how
+    often each rule (explanation) decided an assessment, as tables and bar
+    charts. Only the aggregated counts are needed, so this is cheap for any
+    cohort size.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles = getSampleStyleSheet()
+    total = summary.total
+    levels = summary.risk_levels()
+    level_totals = summary.level_totals()
+    story = [Paragraph(title, styles["Title"])]
+
+    details = f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    if source:
+        details += f" &nbsp; Source: {source}"
+    story += [Paragraph(details, styles["Normal"]), Spacer(1, 6)]
+    overview = ", ".join(f"{level}: {level_totals[level]} ({_percent(level_totals[level], total)})" for level in levels)
+    story += [Paragraph(f"<b>{total}</b> assessments. {overview}", styles["Normal"]), Spacer(1, 12)]
+
+    # Risk level by age group
+    by_age = summary.risk_by_age()
+    ages = [age for age in by_age if sum(by_age[age].values())]
+    story.append(Paragraph("Risk level by age group", styles["Heading2"]))
+    rows = [["Age group"] + [level.title() for level in levels] + ["Total"]]
+    for age in ages:
+        age_total = sum(by_age[age].values())
+        rows.append([age.title()] + [f"{by_age[age][level]} ({_percent(by_age[age][level], age_total)})"
+                                     for level in levels] + [str(age_total)])
+    story += [_table(rows), Spacer(1, 8)]
+    if ages:
+        story.append(_bar_chart([age.title() for age in ages],
+                                [[by_age[age][level] for age in ages] for level in levels], levels))
+
+    # Risk factor prevalence
+    prevalence = summary.factor_prevalence()
+    story.append(Paragraph("Risk factor prevalence", styles["Heading2"]))
+    rows = [["Risk factor", "All"] + [level.title() for level in levels]]
+    for slot, counts in prevalence.items():
+        rows.append([slot.replace("-", " ").capitalize(), _percent(counts["all"], total)]
+                    + [_percent(counts[level], level_totals[level]) for level in levels])
+    story += [_table(rows), Spacer(1, 8)]
+    if total:
+        names = [slot.replace("-", " ").capitalize() for slot in prevalence]
+        story.append(_bar_chart(names, [[100.0 * prevalence[slot]["all"] / total for slot in prevalence]],
+                                ["all"], horizontal=True, value_format="%.0f%%"))
+
+    # Deciding rules
+    explanations = summary.explanations()
+    story.append(Paragraph("Deciding rules", styles["Heading2"]))
+    rows = [["Rule", "Level", "Count", "Share", "Explanation"]]
+    for rule, level, explanation, count in explanations:
+        rows.append([rule, level, str(count), _percent(count, total), Paragraph(explanation, styles["BodyText"])])
+    story += [_table(rows, col_widths=[75, 45, 50, 45, 280]), Spacer(1, 8)]
+    if explanations:
+        story.append(_bar_chart([rule for rule, _, _, _ in explanations],
+                                [[count for _, _, _, count in explanations]], ["rules"],
+                                horizontal=True, height=max(120, 14 * len(explanations))))
+
+    SimpleDocTemplate(filepath, pagesize=A4, title=title,
+                      leftMargin=50, rightMargin=50, topMargin=50, bottomMargin=50).build(story)
+    return filepath
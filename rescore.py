@@ -0,0 +1,93 @@
+# rescore.py
+#
+# Differential rescoring of a stored cohort after a rule change. An assessment
+# depends only on the patient's input combination (192 of them), so the new
+# rule set is run once over the whole input space and only the stored rows
+# whose combination now gets a different (risk level, explanation) are
+# rewritten, found through the store's input_code index.
+#
+#   python rescore.py assessments.db                     # stored results vs rules.clp
+#   python rescore.py assessments.db --old old_rules.clp # only what the edit changed
+#   python rescore.py assessments.db --dry-run           # report, write nothing
+#
+# Without --old, the stored results themselves serve as the old side, which
+# also catches rows scored by any earlier rule set.
+
+import argparse
+import logging
+import sys
+import time
+from collections import Counter
+
+import codec
+import engine
+from store import AssessmentStore
+
+
+def changed_combinations(new_table, old_table=None, stored=None):
+    # Input codes whose result differs between the old rules (or the stored
+    # rows, given as store.result_counts()) and new_table
+    if old_table is not None:
+        return [code for code in range(codec.TABLE_SIZE) if old_table[code] != new_table[code]]
+    changed = set()
+    for code, risk_level, explanation in stored:
+        if (risk_level, explanation) != tuple(new_table[code]):
+            changed.add(code)
+    return sorted(changed)
+
+
+def risk_level_counts(stored, new_table=None, codes=()):
+    # Rows per risk level, as stored or with codes rescored from new_table
+    codes = set(codes)
+    counts = Counter()
+    for (code, risk_level, _), count in stored.items():
+        if code in codes:
+            risk_level = new_table[code][0]
+        counts[risk_level] += count
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore only the stored assessments a rule change affects.")
+    parser.add_argument("store", help="SQLite assessment store to rescore")
+    parser.add_argument("--old", help="rule file the cohort was scored with (default: use the stored results)")
+    parser.add_argument("--new", default=engine.RULES_PATH, help="rule file to rescore with (default: rules.clp)")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    start = time.perf_counter()
+    new_table = engine.ruleset_table(args.new)
+    old_table = engine.ruleset_table(args.old) if args.old else None
+
+    with AssessmentStore(args.store) as store:
+        stored = store.result_counts()
+        codes = changed_combinations(new_table, old_table, stored)
+        changed = set(codes)
+        affected = sum(count for (code, _, _), count in stored.items() if code in changed)
+
+        print(f"{len(codes)} of {codec.TABLE_SIZE} input combinations changed, {affected} stored rows affected")
+        for code in codes:
+            if old_table is not None:
+                was = old_table[code][0]
+            else:
+                was = "/".join(sorted({risk_level for c, risk_level, _ in stored if c == code})) or "-"
+            print(f"  {code:3d} {codec.unpack_inputs(code)}: {was} -> {new_table[code][0]}")
+
+        before = risk_level_counts(stored)
+        after = risk_level_counts(stored, new_table, codes)
+        print(f"\n{'risk level':12} {'before':>10} {'after':>10}")
+        for risk_level in sorted(set(before) | set(after)):
+            print(f"{risk_level:12} {before[risk_level]:10d} {after[risk_level]:10d}")
+
+        if args.dry_run:
+            print("\nDry run: nothing written")
+        else:
+            updated = store.rescore({code: new_table[code] for code in codes})
+            print(f"\nRescored {updated} rows in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,413 @@
+# service.py
+#
+# Local HTTP JSON scoring service: one warm engine shared by every intake
+# kiosk. Standard library only (asyncio), HTTP/1.1 with keep-alive.
+#
+#   POST /assess        {"age-group": "old", "smoking": "yes", ...}
+#                       -> {"risk-level": "high", "explanation": "..."}
+#   POST /assess/batch  [{...}, {...}] -> [{...}, {...}]
+#   GET  /metrics       Prometheus text: service and engine metrics
+#
+# Either /assess endpoint takes ?ruleset=name[@version] to score with a rule
+# set registered through --ruleset instead of the live rules.
+#
+# Requests are not scored one by one: they wait in a bounded queue and a
+# single batcher drains it every few milliseconds, scoring everything it
+# collected with one engine.infer_risk_batch call on a worker thread. When the
+# queue is full new requests are turned away with 503 and Retry-After rather
+# than piling up, which keeps tail latency predictable under load.
+#
+#   python service.py --port 8080 --window-ms 2 --ruleset clinic-a=rules/clinic_a.clp
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import audit
+import codec
+import engine
+import shadow
+from metrics import EngineMetrics
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    501: "Not Implemented",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class MicroBatcher:
+    """Groups concurrent assessments into batches for the engine.
+
+    submit() queues a list of inputs and waits for its results. One task
+    takes the first waiting job, keeps collecting for window seconds (or
+    until max_batch patients), then scores the lot with one
+    infer_risk_batch call per rule set on a dedicated thread, so the event
+    loop never blocks on CLIPS. The queue holds at most max_queue jobs;
+    submit() raises HTTPError(503) when it is full.
+    """
+
+    def __init__(self, window=0.002, max_batch=256, max_queue=1024, metrics=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = metrics or EngineMetrics()
+        self._queue = asyncio.Queue(max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    async def submit(self, inputs, ruleset=None):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((inputs, future, time.perf_counter(), ruleset))
+        except asyncio.QueueFull:
+            self.metrics.count("rejected")
+            raise HTTPError(503, "Server busy, retry shortly", {"Retry-After": "1"}) from None
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self._queue.get()]
+            patients = len(jobs[0][0])
+            deadline = loop.time() + self.window
+            while patients < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                jobs.append(job)
+                patients += len(job[0])
+
+            by_ruleset = {}
+            for job in jobs:
+                by_ruleset.setdefault(job[3], []).append(job)
+            for ruleset, group in by_ruleset.items():
+                await self._score(loop, group, ruleset)
+
+    async def _score(self, loop, jobs, ruleset):
+        inputs = [user_inputs for job in jobs for user_inputs in job[0]]
+        start = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._executor, engine.infer_risk_batch, inputs, ruleset)
+        except Exception as e:
+            if not isinstance(e, engine.RuleSetError):
+                logging.exception("Batch of %d patients failed", len(inputs))
+            for _, future, _, _ in jobs:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        end = time.perf_counter()
+
+        self.metrics.observe("engine_batch", end - start)
+        self.metrics.count("batches")
+        self.metrics.count("patients", len(inputs))
+        position = 0
+        for job_inputs, future, queued, _ in jobs:
+            self.metrics.observe("queue_wait", start - queued)
+            if not future.done():
+                future.set_result(results[position:position + len(job_inputs)])
+            position += len(job_inputs)
+
+
+def _assessment(result):
+    risk_level, explanation = result
+    return {"risk-level": str(risk_level), "explanation": str(explanation)}
+
+
+def _validate(record):
+    if not isinstance(record, dict):
+        raise HTTPError(400, "Expected a JSON object")
+    try:
+        return codec.normalize(record)
+    except ValueError as e:
+        raise HTTPError(400, str(e)) from None
+
+
+class ScoringService:
+    """The HTTP side: parses requests, routes them and writes responses."""
+
+    def __init__(self, batcher, max_body=1024 * 1024, max_batch_request=10000, keepalive_timeout=15.0,
+                 read_timeout=10.0, shadow=None):
+        self.batcher = batcher
+        self.shadow = shadow
+        self.metrics = batcher.metrics
+        self.max_body = max_body
+        self.max_batch_request = max_batch_request
+        self.keepalive_timeout = keepalive_timeout
+        self.read_timeout = read_timeout
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, e.headers, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+
+                start = time.perf_counter()
+                try:
+                    status, payload, extra = await self._dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                except Exception as e:
+                    logging.exception("Request %s %s failed", method, target)
+                    status, payload, extra = 503, {"error": f"Assessment failed: {e}"}, {}
+                self.metrics.count(f"responses_{status}")
+                if target.startswith("/assess"):
+                    self.metrics.observe("request", time.perf_counter() - start)
+
+                await self._respond(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        # (method, target, headers, body, keep_alive), or None once the client
+        # closes the connection or stays idle past keepalive_timeout. Headers
+        # and body must then arrive within read_timeout.
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            raise HTTPError(400, "Request line too long") from None
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+
+        try:
+            headers, body = await asyncio.wait_for(self._read_message(reader), self.read_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Timed out reading the request") from None
+
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            keep_alive = connection != "close"
+        else:
+            keep_alive = connection == "keep-alive"
+        return method, target, headers, body, keep_alive
+
+    async def _read_message(self, reader):
+        # Headers and body following the request line
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # Longer than the StreamReader limit
+                raise HTTPError(431, "Header line too long") from None
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "transfer-encoding" in headers:
+            raise HTTPError(501, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length > self.max_body:
+            raise HTTPError(413, f"Request body over {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return headers, body
+
+    async def _dispatch(self, method, target, body):
+        path, _, query = target.partition("?")
+        if path == "/metrics":
+            if method != "GET":
+                raise HTTPError(405, "Use GET", {"Allow": "GET"})
+            return 200, self.prometheus(), {"Content-Type": "text/plain; version=0.0.4"}
+
+        if path not in ("/assess", "/assess/batch"):
+            raise HTTPError(404, f"No such endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST", {"Allow": "POST"})
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}") from None
+        ruleset = urllib.parse.parse_qs(query).get("ruleset", [None])[-1]
+        if ruleset is not None:
+            try:
+                ruleset = engine.registry.resolve(ruleset)
+            except engine.RuleSetError as e:
+                raise HTTPError(404, str(e)) from None
+
+        if path == "/assess":
+            results = await self.batcher.submit([_validate(data)], ruleset)
+            return 200, _assessment(results[0]), {}
+
+        if not isinstance(data, list):
+            raise HTTPError(400, "Expected a JSON array of patients")
+        if len(data) > self.max_batch_request:
+            raise HTTPError(413, f"More than {self.max_batch_request} patients in one request")
+        inputs = []
+        for position, record in enumerate(data):
+            try:
+                inputs.append(_validate(record))
+            except HTTPError as e:
+                raise HTTPError(400, f"Patient {position}: {e}") from None
+        results = await self.batcher.submit(inputs, ruleset) if inputs else []
+        return 200, [_assessment(result) for result in results], {}
+
+    def prometheus(self):
+        text = self.metrics.to_prometheus("service")
+        text += (
+            "# HELP service_queue_depth Jobs waiting for the batcher.\n"
+            "# TYPE service_queue_depth gauge\n"
+            f"service_queue_depth {self.batcher.depth()}\n"
+        )
+        if self.shadow is not None:
+            report = self.shadow.report()
+            text += (
+                "# HELP service_shadow_total Sampled assessments compared with the candidate rule set.\n"
+                "# TYPE service_shadow_total counter\n"
+            )
+            for outcome in ("compared", "disagreements", "dropped", "skipped"):
+                text += f'service_shadow_total{{outcome="{outcome}"}} {report[outcome]}\n'
+        rulesets = engine.registry.stats()
+        if rulesets:
+            text += (
+                "# HELP service_ruleset_total Registered rule set loads, LRU hits and evictions.\n"
+                "# TYPE service_ruleset_total counter\n"
+            )
+            for key, stats in rulesets.items():
+                for event in ("loads", "hits", "evictions"):
+                    text += f'service_ruleset_total{{ruleset="{key}",event="{event}"}} {stats[event]}\n'
+            text += (
+                "# HELP service_ruleset_bytes CLIPS memory of each compiled rule set, 0 if not loaded.\n"
+                "# TYPE service_ruleset_bytes gauge\n"
+            )
+            for key, stats in rulesets.items():
+                text += f'service_ruleset_bytes{{ruleset="{key}"}} {stats["bytes"]}\n'
+        return text + engine.metrics.to_prometheus("engine")
+
+    async def _respond(self, writer, status, payload, headers, keep_alive):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            headers = {"Content-Type": "application/json", **headers}
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        for name, value in headers.items():
+            lines.append(f"{name}: {value}")
+        lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8080, window=0.002, max_batch=256, max_queue=1024, shadow=None):
+    batcher = MicroBatcher(window=window, max_batch=max_batch, max_queue=max_queue)
+    batcher.start()
+    service = ScoringService(batcher, shadow=shadow)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logging.warning("Scoring service listening on http://%s:%d", host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve risk assessments over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="how long the batcher collects requests before scoring (default: 2)")
+    parser.add_argument("--max-batch", type=int, default=256, help="patients per engine batch (default: 256)")
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="queued requests before answering 503 (default: 1024)")
+    parser.add_argument("--decision-table", action="store_true", help="serve from the precomputed decision table")
+    parser.add_argument("--profile", action="store_true", help="collect engine metrics for /metrics")
+    parser.add_argument("--watch-rules", action="store_true", help="reload rules.clp when it changes")
+    parser.add_argument("--audit", metavar="PATH", help="write a JSONL audit record per assessment here")
+    parser.add_argument("--shadow", metavar="RULES", help="also score live traffic with this candidate rule file")
+    parser.add_argument("--shadow-rate", type=float, default=1.0,
+                        help="fraction of assessments shadowed (default: 1.0)")
+    parser.add_argument("--ruleset", action="append", default=[], metavar="NAME[@VERSION]=PATH",
+                        help="register a rule file for ?ruleset=NAME requests (repeatable)")
+    parser.add_argument("--max-rulesets", type=int, default=8,
+                        help="registered rule sets kept compiled at once (default: 8)")
+    args = parser.parse_args(argv)
+
+    # Warnings and errors; rule reloads and rule set loads are logged at INFO
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    if args.decision_table:
+        engine.enable_decision_table()
+    if args.profile:
+        engine.metrics.enable()
+    if args.watch_rules:
+        engine.watch_rules()
+    engine.registry.max_loaded = args.max_rulesets
+    for spec in args.ruleset:
+        name, separator, path = spec.partition("=")
+        if not separator:
+            parser.error(f"--ruleset expects NAME=PATH, got {spec!r}")
+        name, _, version = name.partition("@")
+        engine.registry.register(name, path, version or None)
+    if args.audit:
+        audit.start_audit(args.audit)
+    evaluator = shadow.start_shadow(args.shadow, args.shadow_rate) if args.shadow else None
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.window_ms / 1000, args.max_batch, args.max_queue, evaluator))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        audit.stop_audit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
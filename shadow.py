@@ -0,0 +1,192 @@
+# shadow.py
+#
+# Shadow evaluation of a candidate rule set against live traffic. Every live
+# infer_risk / infer_risk_batch result is offered to a ShadowEvaluator with
+# the patient's input code; it samples it and drops it on a bounded queue,
+# which is all the live path pays. A background thread scores the sampled
+# patients with both the live and the candidate rules in its own
+# environments, and records per (live rule, candidate rule) pair how often
+# they were compared and how often the results disagreed, with a few example
+# patients for each.
+#
+#   evaluator = shadow.start_shadow("rules.candidate.clp", sample_rate=0.1)
+#   ...
+#   print(shadow.format_report(evaluator.report()))
+#
+# Results depend only on the input combination, so the worker caches both
+# decisions per combination; the cache is dropped when the live rules
+# are reloaded.
+
+import logging
+import queue
+import random
+import threading
+from collections import deque
+
+import codec
+import engine
+
+
+class ShadowEvaluator:
+    """Compares live assessments with a candidate rule set in the background.
+
+    sample_rate is the fraction of live calls compared. At most queue_size
+    patients wait for the worker; further offers are dropped (and counted)
+    rather than slowing the caller. Up to samples_per_pair disagreeing
+    patients are kept for each rule pair, so memory stays bounded.
+    """
+
+    def __init__(self, candidate_path, sample_rate=1.0, queue_size=10000, samples_per_pair=5):
+        self.candidate_path = candidate_path
+        self.sample_rate = sample_rate
+        self.samples_per_pair = samples_per_pair
+        self._candidate = engine.build_environment(candidate_path)
+        self._live = None
+        self._generation = None
+        self._decisions = {}
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._pairs = {}
+            self.compared = 0
+            self.dropped = 0
+            self.skipped = 0
+
+    # Live path: must stay cheap and never raise
+
+    def offer(self, code, result):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((code, result))
+        except queue.Full:
+            self.dropped += 1
+
+    def offer_many(self, codes, results):
+        for code, result in zip(codes, results):
+            self.offer(code, result)
+
+    # Worker
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="shadow-evaluator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        # Finish the queued comparisons, then stop the worker
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._compare(*item)
+            except Exception:
+                logging.exception("Shadow evaluation failed")
+
+    def _decide(self, code):
+        # (live rule, live result, candidate rule, candidate result) for an input combination
+        generation = engine.ruleset_generation
+        if generation != self._generation:
+            self._live = engine.create_environment()
+            self._generation = generation
+            self._decisions.clear()
+
+        decision = self._decisions.get(code)
+        if decision is None:
+            live_rule, *live = engine.evaluate_traced(self._live, code)
+            candidate_rule, *candidate = engine.evaluate_traced(self._candidate, code)
+            decision = self._decisions[code] = (live_rule, tuple(live), candidate_rule, tuple(candidate))
+        return decision
+
+    def _compare(self, code, result):
+        live_rule, live, candidate_rule, candidate = self._decide(code)
+        if tuple(result) != live:
+            # Scored by rules that have since been reloaded
+            self.skipped += 1
+            return
+
+        with self._lock:
+            self.compared += 1
+            pair = self._pairs.get((live_rule, candidate_rule))
+            if pair is None:
+                pair = self._pairs[(live_rule, candidate_rule)] = {
+                    "compared": 0,
+                    "disagreements": 0,
+                    "samples": deque(maxlen=self.samples_per_pair),
+                }
+            pair["compared"] += 1
+            if candidate != live:
+                pair["disagreements"] += 1
+                pair["samples"].append({
+                    "inputs": codec.unpack_inputs(code),
+                    "live": live,
+                    "candidate": candidate,
+                })
+
+    # Reporting
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def report(self):
+        with self._lock:
+            pairs = [{
+                "live_rule": live_rule,
+                "candidate_rule": candidate_rule,
+                "compared": pair["compared"],
+                "disagreements": pair["disagreements"],
+                "samples": list(pair["samples"]),
+            } for (live_rule, candidate_rule), pair in self._pairs.items()]
+            pairs.sort(key=lambda pair: (-pair["disagreements"], -pair["compared"]))
+            return {
+                "candidate": self.candidate_path,
+                "sample_rate": self.sample_rate,
+                "compared": self.compared,
+                "disagreements": sum(pair["disagreements"] for pair in pairs),
+                "dropped": self.dropped,
+                "skipped": self.skipped,
+                "pending": self.pending(),
+                "pairs": pairs,
+            }
+
+
+def format_report(report):
+    lines = [
+        f"Shadow rules {report['candidate']}: {report['disagreements']} of {report['compared']} "
+        f"sampled assessments disagree (sample rate {report['sample_rate']:g}, "
+        f"{report['dropped']} dropped, {report['skipped']} skipped)",
+    ]
+    for pair in report["pairs"]:
+        if not pair["disagreements"]:
+            continue
+        lines.append(f"  {pair['live_rule']} -> {pair['candidate_rule']}: "
+                     f"{pair['disagreements']} of {pair['compared']} disagree")
+        for sample in pair["samples"]:
+            lines.append(f"    {sample['inputs']}: {sample['live'][0]} -> {sample['candidate'][0]}")
+    return "\n".join(lines)
+
+
+def start_shadow(candidate_path, sample_rate=1.0, **options):
+    # Start shadowing live traffic with the rules in candidate_path
+    evaluator = ShadowEvaluator(candidate_path, sample_rate, **options).start()
+    engine.set_shadow(evaluator)
+    return evaluator
+
+
+def stop_shadow():
+    # Detach the current evaluator, finish its queue and return it
+    evaluator = engine.set_shadow(None)
+    if evaluator is not None:
+        evaluator.stop()
+    return evaluator
@@ -0,0 +1,258 @@
+# store.py
+#
+# Embedded SQLite store for assessments. Inputs are kept as the packed 0..191
+# code from codec.encode and explanations are interned in their own table, so
+# a row is a handful of integers plus a timestamp. Inserts are buffered and
+# written in batches inside one transaction; the database runs in WAL mode so
+# readers are never blocked by the writer.
+
+import sqlite3
+import threading
+from datetime import datetime
+
+import codec
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanations (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    input_code INTEGER NOT NULL,
+    risk_level TEXT NOT NULL,
+    explanation_id INTEGER NOT NULL REFERENCES explanations(id),
+    report_path TEXT
+);
+CREATE INDEX IF NOT EXISTS assessments_risk_level ON assessments(risk_level, created_at);
+CREATE INDEX IF NOT EXISTS assessments_created_at ON assessments(created_at);
+CREATE INDEX IF NOT EXISTS assessments_input_code ON assessments(input_code);
+"""
+
+GROUPINGS = {
+    "risk_level": "risk_level",
+    "age_group": "input_code >> 6",
+    "input_code": "input_code",
+}
+
+
+def _timestamp(value=None):
+    if value is None:
+        value = datetime.now()
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    return str(value)
+
+
+class AssessmentStore:
+    """Assessments persisted in SQLite, with batched writes and paged reads.
+
+    Safe to share between threads (the GUI writes from its worker thread).
+    Call flush() or close() to write out buffered add() calls.
+    """
+
+    def __init__(self, path="assessments.db", batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._explanation_ids = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        for explanation_id, text in self._conn.execute("SELECT id, text FROM explanations"):
+            self._explanation_ids[text] = explanation_id
+
+    # Writing
+
+    def _row(self, user_inputs, risk_level, explanation, created_at):
+        code = codec.encode(user_inputs)
+        return (_timestamp(created_at), code, str(risk_level), str(explanation))
+
+    def add(self, user_inputs, risk_level, explanation, created_at=None):
+        # Buffer one assessment; written once batch_size are pending
+        row = self._row(user_inputs, risk_level, explanation, created_at)
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def add_many(self, assessments):
+        # assessments: iterable of (user_inputs, risk_level, explanation[, created_at])
+        for assessment in assessments:
+            self.add(*assessment)
+
+    def insert(self, user_inputs, risk_level, explanation, created_at=None):
+        # Write one assessment immediately and return its id
+        row = self._row(user_inputs, risk_level, explanation, created_at)
+        with self._lock:
+            self._flush()
+            created = {}
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO assessments (created_at, input_code, risk_level, explanation_id) VALUES (?, ?, ?, ?)",
+                    row[:3] + (self._explanation_id(row[3], created),),
+                )
+            self._explanation_ids.update(created)
+            return cursor.lastrowid
+
+    def set_report_path(self, assessment_id, report_path):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE assessments SET report_path = ? WHERE id = ?", (report_path, assessment_id))
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        created = {}
+        with self._conn:
+            rows = [row[:3] + (self._explanation_id(row[3], created),) for row in self._pending]
+            self._conn.executemany(
+                "INSERT INTO assessments (created_at, input_code, risk_level, explanation_id) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        self._explanation_ids.update(created)
+        self._pending.clear()
+
+    def _explanation_id(self, text, created):
+        # Id of an explanation, interning it inside the caller's transaction.
+        # New ids go into created, and only reach the cache once the caller
+        # has committed: a rolled-back transaction takes the rows with it.
+        explanation_id = self._explanation_ids.get(text) or created.get(text)
+        if explanation_id is None:
+            self._conn.execute("INSERT OR IGNORE INTO explanations (text) VALUES (?)", (text,))
+            explanation_id = self._conn.execute("SELECT id FROM explanations WHERE text = ?", (text,)).fetchone()[0]
+            created[text] = explanation_id
+        return explanation_id
+
+    # Reading
+
+    def _where(self, risk_level=None, since=None, until=None, user_inputs=None, input_code=None):
+        clauses, params = [], []
+        if risk_level is not None:
+            clauses.append("risk_level = ?")
+            params.append(risk_level)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(_timestamp(until))
+        if user_inputs is not None:
+            input_code = codec.encode(user_inputs)
+        if input_code is not None:
+            clauses.append("input_code = ?")
+            params.append(input_code)
+        return clauses, params
+
+    def query(self, limit=50, after=None, **filters):
+        """One page of assessments, newest first.
+
+        filters: risk_level, since, until (datetimes or ISO strings), user_inputs
+        or input_code. Pass the returned cursor as after= to get the next page;
+        it is None on the last page. Paging is keyset-based, so deep pages cost
+        the same as the first.
+        """
+        self.flush()
+        clauses, params = self._where(**filters)
+        if after is not None:
+            clauses.append("(a.created_at, a.id) < (?, ?)")
+            params.extend(after)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        sql = (
+            "SELECT a.id, a.created_at, a.input_code, a.risk_level, e.text, a.report_path "
+            "FROM assessments a JOIN explanations e ON e.id = a.explanation_id "
+            f"{where} ORDER BY a.created_at DESC, a.id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit]).fetchall()
+
+        page = [{
+            "id": assessment_id,
+            "created_at": created_at,
+            "inputs": codec.unpack_inputs(code),
+            "risk_level": risk_level,
+            "explanation": explanation,
+            "report_path": report_path,
+        } for assessment_id, created_at, code, risk_level, explanation, report_path in rows]
+        cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return page, cursor
+
+    def count(self, **filters):
+        self.flush()
+        clauses, params = self._where(**filters)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM assessments {where}", params).fetchone()[0]
+
+    def counts(self, group_by="risk_level", **filters):
+        # Aggregate counts keyed by risk level, age group or input code
+        self.flush()
+        clauses, params = self._where(**filters)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        key = GROUPINGS[group_by]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {key}, COUNT(*) FROM assessments {where} GROUP BY {key}", params
+            ).fetchall()
+        if group_by == "age_group":
+            return {codec.AGE_GROUPS[age]: count for age, count in rows}
+        return dict(rows)
+
+    def result_counts(self, **filters):
+        # {(input_code, risk_level, explanation): count}: at most a few hundred
+        # groups, since results depend only on the input combination. Takes the
+        # same filters as query().
+        self.flush()
+        clauses, params = self._where(**filters)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.input_code, a.risk_level, e.text, COUNT(*) "
+                f"FROM assessments a JOIN explanations e ON e.id = a.explanation_id {where} "
+                "GROUP BY a.input_code, a.risk_level, a.explanation_id",
+                params,
+            ).fetchall()
+        return {(code, risk_level, explanation): count for code, risk_level, explanation, count in rows}
+
+    # Rescoring
+
+    def rescore(self, results):
+        """Overwrite the stored result of every row with the given input codes.
+
+        results maps input_code to its new (risk_level, explanation). Rows are
+        found through the input_code index, so only the affected combinations
+        are touched. Returns the number of rows changed.
+        """
+        with self._lock:
+            self._flush()
+            updated = 0
+            created = {}
+            with self._conn:
+                for code, (risk_level, explanation) in results.items():
+                    explanation_id = self._explanation_id(str(explanation), created)
+                    cursor = self._conn.execute(
+                        "UPDATE assessments SET risk_level = ?, explanation_id = ? "
+                        "WHERE input_code = ? AND (risk_level != ? OR explanation_id != ?)",
+                        (str(risk_level), explanation_id, code, str(risk_level), explanation_id),
+                    )
+                    updated += cursor.rowcount
+            self._explanation_ids.update(created)
+        return updated
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,167 @@
+# vectorized.py
+#
+# Columnar scoring backend for very large screening files. Each rule in
+# engine.CONSTRUCTS is mirrored here as a NumPy mask; the masks are checked in
+# the engine's firing order (salience, then definition order for ties) and the
+# first match wins, exactly as the CLIPS agenda would decide. Rule names,
+# salience, risk levels and explanations are read from the engine's rule
+# sources, so only the left-hand sides live here. verify_against_engine()
+# checks the whole input space against CLIPS; score() runs it whenever the
+# rule set changes and refuses to score while the two disagree.
+
+import logging
+import threading
+
+import numpy as np
+
+import codec
+import engine
+
+LEVELS = ("low", "medium", "high")
+
+YOUNG, MIDDLE, OLD = range(len(codec.AGE_GROUPS))
+
+
+def _count(*flags):
+    return sum(flag.astype(np.int8) for flag in flags)
+
+
+# Left-hand side of every rule, keyed by rule name. Arguments are the age-group
+# code array (codec.AGE_GROUPS order) and the six yes/no columns as booleans.
+CONDITIONS = {
+    "high-risk-1": lambda age, s, e, b, c, f, i: s & b & c,
+    "high-risk-2": lambda age, s, e, b, c, f, i: e & i & b,
+    "high-risk-3": lambda age, s, e, b, c, f, i: (age == OLD) & b & c,
+    "high-risk-4": lambda age, s, e, b, c, f, i: b & c & (_count(s, e, f, i) >= 2),
+    "medium-risk-1": lambda age, s, e, b, c, f, i: b | c,
+    "medium-risk-2": lambda age, s, e, b, c, f, i: s & ~b & ~c & ~e & ~f & ~i,
+    "medium-risk-3": lambda age, s, e, b, c, f, i: f & e & ~b & ~c,
+    "medium-risk-4": lambda age, s, e, b, c, f, i: ~b & ~c & (_count(s, e, f, i) >= 2),
+    "medium-risk-5": lambda age, s, e, b, c, f, i: ~b & c & (s | e | f | i),
+    "medium-risk-6": lambda age, s, e, b, c, f, i: (age == OLD) & ~b & ~c & (_count(s, e, f, i) >= 1),
+    "low-risk-1": lambda age, s, e, b, c, f, i: ~s & ~e & ~i & ~b & ~c & ~f,
+    "low-risk-2": lambda age, s, e, b, c, f, i: (age == YOUNG) & ~s & ~e & ~b & ~c & ~i,
+    "low-risk-3": lambda age, s, e, b, c, f, i: (age == MIDDLE) & ~s & ~e & ~f & ~i & ~b & ~c,
+    "low-risk-4": lambda age, s, e, b, c, f, i: ~s & ~e & ~b & ~c & ~i & f,
+    "low-risk-5": lambda age, s, e, b, c, f, i: ~b & ~c & (_count(s, e, f, i) <= 1),
+    "default-risk": lambda age, s, e, b, c, f, i: np.ones_like(b),
+}
+
+
+def _load_rules():
+    global RULES, RULE_NAMES, EXPLANATIONS, _ORDER, _LEVEL_CODES
+    rules = engine.rule_summaries()
+    missing = {name for name, _, _, _ in rules} - set(CONDITIONS)
+    if missing:
+        raise RuntimeError(f"No vectorized condition for rules: {', '.join(sorted(missing))}")
+
+    RULES = rules
+    RULE_NAMES = tuple(name for name, _, _, _ in RULES)
+    EXPLANATIONS = tuple(explanation for _, _, _, explanation in RULES)
+    # Firing order: higher salience first; among equal salience the rule defined
+    # first wins, which is how the engine's agenda breaks these ties.
+    _ORDER = sorted(range(len(RULES)), key=lambda index: -RULES[index][1])
+    _LEVEL_CODES = np.array([LEVELS.index(level) for _, _, level, _ in RULES], dtype=np.uint8)
+
+
+# Fingerprint of the rule set the masks were last verified against, and why
+# they disagree with it (None when they match). score() verifies on first use
+# and whenever the rules change, so an offline edit to rules.clp is caught
+# too, and refuses to run while _stale is set.
+_verified = None
+_stale = None
+_verify_lock = threading.Lock()
+
+
+def _verify_rules():
+    global _verified, _stale
+    with _verify_lock:
+        fingerprint = engine.ruleset_fingerprint()
+        if fingerprint == _verified:
+            return
+        try:
+            _load_rules()
+        except RuntimeError as e:
+            _stale = str(e)
+        else:
+            mismatches = verify_against_engine()
+            _stale = (f"{len(mismatches)}/{codec.TABLE_SIZE} combinations differ from the engine's rules"
+                      if mismatches else None)
+        _verified = fingerprint
+        if _stale is not None:
+            logging.error("Vectorized backend disabled: %s", _stale)
+
+
+@engine.on_reload
+def _reload_rules():
+    # Check reloaded rules straight away rather than on the next score()
+    _verify_rules()
+
+
+_load_rules()
+
+
+def _score_chunk(age, columns):
+    masks = [CONDITIONS[RULE_NAMES[index]](age, *columns) for index in _ORDER]
+    rule_index = np.select(masks, _ORDER, default=RULE_NAMES.index("default-risk")).astype(np.uint8)
+    return _LEVEL_CODES[rule_index], rule_index
+
+
+def score(age, smoking, exposure, breathing_issue, chest_tightness, family_history, long_term_illness,
+          chunk_size=1_000_000):
+    """Score whole columns at once.
+
+    age is an integer array of codec.AGE_GROUPS codes; the other six are
+    boolean (or 0/1) arrays of the same length. Returns (level codes into
+    LEVELS, explanation indices into EXPLANATIONS), both uint8. Work is done in
+    chunks so temporary masks stay bounded for very long columns.
+    """
+    if _verified != engine.ruleset_fingerprint():
+        _verify_rules()
+    if _stale is not None:
+        raise RuntimeError(f"Vectorized backend disabled: {_stale}")
+    return _score(age, (smoking, exposure, breathing_issue, chest_tightness, family_history, long_term_illness),
+                  chunk_size)
+
+
+def _score(age, flags, chunk_size):
+    age = np.asarray(age)
+    flags = [np.asarray(column).astype(bool, copy=False) for column in flags]
+
+    levels = np.empty(len(age), dtype=np.uint8)
+    explanations = np.empty(len(age), dtype=np.uint8)
+    for start in range(0, len(age), chunk_size):
+        window = slice(start, start + chunk_size)
+        levels[window], explanations[window] = _score_chunk(age[window], [flag[window] for flag in flags])
+    return levels, explanations
+
+
+def score_packed(codes, chunk_size=1_000_000):
+    # Score an array of input codes (see codec.py)
+    age, flags = codec.decode_codes(codes)
+    return score(age, *flags, chunk_size=chunk_size)
+
+
+def verify_against_engine():
+    # Compare with the CLIPS engine over every input combination; returns the
+    # mismatches. The engine side runs in a private environment, so nothing
+    # reaches the audit trail, the shadow evaluator or the metrics.
+    codes = np.arange(codec.TABLE_SIZE)
+    age, flags = codec.decode_codes(codes)
+    levels, explanations = _score(age, flags, codec.TABLE_SIZE)
+    expected = engine.ruleset_table()
+
+    mismatches = []
+    for code, level, explanation, result in zip(codes, levels, explanations, expected):
+        got = (LEVELS[level], EXPLANATIONS[explanation])
+        if got != tuple(str(value) for value in result):
+            mismatches.append((codec.unpack_inputs(int(code)), got, result))
+    return mismatches
+
+
+if __name__ == "__main__":
+    mismatches = verify_against_engine()
+    for user_inputs, got, expected in mismatches:
+        print(f"{user_inputs}: vectorized {got[0]} / engine {expected[0]}")
+    print(f"{codec.TABLE_SIZE - len(mismatches)}/{codec.TABLE_SIZE} combinations match the CLIPS engine")
+    raise SystemExit(1 if mismatches else 0)